@@ -1,40 +1,181 @@
 // SPDX-License-Identifier: AGPL-3.0
 pragma solidity 0.8.14;
 
+import "./interfaces/IAllocationPolicy.sol";
 import "./interfaces/IVault.sol";
 import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
+import "@openzeppelin/contracts/utils/math/Math.sol";
+import "@openzeppelin/contracts/utils/math/SafeCast.sol";
 
 interface ILenderStrategy {
+    // _delta is signed: negative values evaluate the APR after withdrawing
     function aprAfterDebtChange(
         int256 _delta
     ) external view returns (uint256 _apr);
+
+    function balanceOf(address _owner) external view returns (uint256);
+
+    function convertToAssets(uint256 _shares) external view returns (uint256);
+
+    function tendTrigger() external view returns (bool);
+
+    function maxWithdraw(address _owner) external view returns (uint256);
 }
 
 contract LenderDebtManager {
+    event EmergencyExit(
+        address indexed strategy,
+        uint256 released,
+        uint256 remainingDebt
+    );
+
+    // a lender that reverts is skipped so it can't hold up the other exits
+    event EmergencyExitFailed(address indexed strategy, bytes reason);
+
+    event RoleSet(address indexed account, uint256 roles);
+
+    event GovernanceTransferred(address indexed governance);
+
+    event AllocationPolicySet(address indexed allocationPolicy);
+
+    modifier onlyGovernance() {
+        require(msg.sender == governance, "not governance");
+        _;
+    }
+
+    // one SLOAD: every role of an account sits in a single bitmask
+    modifier onlyRole(uint256 _role) {
+        require(roles[msg.sender] & _role == _role, "not allowed");
+        _;
+    }
+
+    // packed in a single slot, so the allocator reads it with one SLOAD
+    struct StrategyConfig {
+        bool enabled;
+        // being emptied after an emergency, never funded again until re-enabled
+        bool exiting;
+        // bounds of the strategy debt, in bps of the vault total assets
+        uint16 minAllocationBps;
+        uint16 maxAllocationBps;
+        // breaks APR ties: higher priority gets funds first and loses them last
+        uint8 priority;
+        // last APR the allocator saw when moving funds in or out
+        uint96 lastApr;
+        // ring slot of the latest APR observation and how many slots are filled
+        uint8 observationIndex;
+        uint8 observationCount;
+    }
+
+    // one slot per observation, same accumulator scheme as an oracle TWAP
+    struct Observation {
+        uint32 timestamp;
+        // spot APR from this observation until the next one
+        uint96 apr;
+        // sum of apr * seconds since the first observation, wraps on overflow
+        uint128 aprCumulative;
+    }
+
+    // same bits as the vault roles
+    uint256 public constant STRATEGY_MANAGER = 1;
+    uint256 public constant DEBT_MANAGER = 2;
+    uint256 public constant EMERGENCY_MANAGER = 4;
+    uint256 public constant KEEPER = 16;
+
+    uint256 internal constant MAX_BPS = 10_000;
+    uint256 public constant OBSERVATION_CARDINALITY = 24;
+    // keeps the gas of every loop over strategies bounded
+    uint256 public constant MAX_STRATEGIES = 128;
+    uint256 public constant MAX_IDLE_CHUNKS = 100;
+    // splitting idle takes at most idleChunks + idleSplitCount rounds of one
+    // aprAfterDebtChange per target, this caps their product to fit a block
+    uint256 public constant MAX_IDLE_SPLIT_CALLS = 2_000;
+
     IVault public immutable vault;
     IERC20 public immutable asset;
+    address public governance;
+    address public futureGovernance;
+    mapping(address => uint256) public roles;
     address[] public strategies;
+    mapping(address => StrategyConfig) public strategyConfigs;
+    mapping(address => Observation[OBSERVATION_CARDINALITY])
+        internal observations;
 
     uint256 public lastBlockUpdate;
 
+    // number of strategies idle is split across, 1 sends it all to the best one.
+    // Like idleChunks, only read by the built-in policy: a set allocationPolicy
+    // already decides where every unit of idle goes
+    uint256 public idleSplitCount = 1;
+    // pieces the idle is cut into when split across strategies
+    uint256 public idleChunks = 10;
+
+    // seconds of APR history the allocator averages over, 0 trusts spot APRs
+    uint256 public twapWindow;
+
+    // gas an emergency exit may spend before it stops redeploying idle
+    uint256 public emergencyGasBudget = 1_500_000;
+
+    // where updateAllocations gets its target debts, unset runs the built-in
+    // lowest to highest APR move
+    IAllocationPolicy public allocationPolicy;
+
     constructor(IVault _vault) {
         vault = _vault;
         asset = IERC20(_vault.asset());
+        governance = msg.sender;
+        roles[msg.sender] =
+            STRATEGY_MANAGER |
+            DEBT_MANAGER |
+            EMERGENCY_MANAGER |
+            KEEPER;
         lastBlockUpdate = block.timestamp;
     }
 
-    function addStrategy(address _strategy /* onlyAuthorized */) external {
+    function setRole(address _account, uint256 _roles) external onlyGovernance {
+        roles[_account] = _roles;
+        emit RoleSet(_account, _roles);
+    }
+
+    function setFutureGovernance(
+        address _futureGovernance
+    ) external onlyGovernance {
+        futureGovernance = _futureGovernance;
+    }
+
+    function acceptGovernance() external {
+        require(msg.sender == futureGovernance, "not future governance");
+        governance = msg.sender;
+        futureGovernance = address(0);
+        emit GovernanceTransferred(msg.sender);
+    }
+
+    function addStrategy(
+        address _strategy
+    ) external onlyRole(STRATEGY_MANAGER) {
         require(vault.strategies(_strategy).activation != 0);
+        require(strategies.length < MAX_STRATEGIES, "too many strategies");
 
         for (uint256 i = 0; i < strategies.length; ++i) {
             if (strategies[i] == _strategy) return;
         }
 
         strategies.push(_strategy);
+        strategyConfigs[_strategy] = StrategyConfig({
+            enabled: true,
+            exiting: false,
+            minAllocationBps: 0,
+            maxAllocationBps: uint16(MAX_BPS),
+            priority: 0,
+            lastApr: 0,
+            observationIndex: 0,
+            observationCount: 0
+        });
     }
 
     // TODO: Permissionless remove when not in vault, permissioned when in vault
-    function removeStrategy(address _strategy /* onlyAuthorized */) external {
+    function removeStrategy(
+        address _strategy
+    ) external onlyRole(STRATEGY_MANAGER) {
         uint256 strategyCount = strategies.length;
         for (uint256 i = 0; i < strategyCount; ++i) {
             if (strategies[i] == _strategy) {
@@ -43,12 +184,201 @@ contract LenderDebtManager {
                     strategies[i] = strategies[strategyCount - 1];
                 }
                 strategies.pop();
+                delete strategyConfigs[_strategy];
                 return;
             }
         }
     }
 
-    function updateAllocations() public {
+    function setStrategyConfig(
+        address _strategy,
+        bool _enabled,
+        uint16 _minAllocationBps,
+        uint16 _maxAllocationBps,
+        uint8 _priority
+    ) external onlyRole(STRATEGY_MANAGER) {
+        require(_isManaged(_strategy), "unknown strategy");
+        require(
+            _minAllocationBps <= _maxAllocationBps &&
+                _maxAllocationBps <= MAX_BPS,
+            "invalid bounds"
+        );
+
+        StrategyConfig storage config = strategyConfigs[_strategy];
+        config.enabled = _enabled;
+        if (_enabled) config.exiting = false;
+        config.minAllocationBps = _minAllocationBps;
+        config.maxAllocationBps = _maxAllocationBps;
+        config.priority = _priority;
+    }
+
+    function setStrategyEnabled(
+        address _strategy,
+        bool _enabled
+    ) external onlyRole(STRATEGY_MANAGER) {
+        require(_isManaged(_strategy), "unknown strategy");
+        strategyConfigs[_strategy].enabled = _enabled;
+        if (_enabled) strategyConfigs[_strategy].exiting = false;
+    }
+
+    function setEmergencyGasBudget(
+        uint256 _emergencyGasBudget
+    ) external onlyGovernance {
+        emergencyGasBudget = _emergencyGasBudget;
+    }
+
+    function setIdleDistribution(
+        uint256 _splitCount,
+        uint256 _chunks
+    ) external onlyRole(DEBT_MANAGER) {
+        require(
+            _splitCount > 0 &&
+                _splitCount <= MAX_STRATEGIES &&
+                _chunks > 0 &&
+                _chunks <= MAX_IDLE_CHUNKS &&
+                _splitCount * (_chunks + _splitCount) <= MAX_IDLE_SPLIT_CALLS,
+            "invalid distribution"
+        );
+        idleSplitCount = _splitCount;
+        idleChunks = _chunks;
+    }
+
+    function setTwapWindow(
+        uint256 _twapWindow
+    ) external onlyRole(DEBT_MANAGER) {
+        twapWindow = _twapWindow;
+    }
+
+    // swapping the policy keeps the debt manager and its vault roles
+    function setAllocationPolicy(
+        IAllocationPolicy _allocationPolicy
+    ) external onlyRole(DEBT_MANAGER) {
+        allocationPolicy = _allocationPolicy;
+        emit AllocationPolicySet(address(_allocationPolicy));
+    }
+
+    // records the spot APR of every enabled strategy between rebalances
+    function pokeAprs() external onlyRole(KEEPER) {
+        for (uint256 i; i < strategies.length; ++i) {
+            if (strategyConfigs[strategies[i]].enabled) {
+                _observe(strategies[i]);
+            }
+        }
+    }
+
+    // pulls everything liquid out of a compromised strategy right away, without
+    // tending, reporting or looking at APRs, and keeps it from being funded again
+    function emergencyExit(
+        address _strategy
+    ) external onlyRole(EMERGENCY_MANAGER) {
+        require(_isManaged(_strategy), "unknown strategy");
+        StrategyConfig storage config = strategyConfigs[_strategy];
+        config.enabled = false;
+        config.exiting = true;
+
+        _exitAll(gasleft());
+    }
+
+    // keeps draining exiting strategies as their liquidity comes back
+    function exitAll() external onlyRole(EMERGENCY_MANAGER) {
+        _exitAll(gasleft());
+    }
+
+    function _exitAll(uint256 _startGas) internal {
+        for (uint256 i; i < strategies.length; ++i) {
+            address _strategy = strategies[i];
+            if (!strategyConfigs[_strategy].exiting) continue;
+
+            uint256 _currentDebt = vault.strategies(_strategy).current_debt;
+            if (_currentDebt == 0) continue;
+
+            uint256 _released;
+            try
+                ILenderStrategy(_strategy).maxWithdraw(address(vault))
+            returns (uint256 _liquid) {
+                _released = Math.min(_currentDebt, _liquid);
+            } catch (bytes memory _reason) {
+                emit EmergencyExitFailed(_strategy, _reason);
+                continue;
+            }
+            if (_released > 0) {
+                try
+                    vault.update_debt(_strategy, _currentDebt - _released)
+                {} catch (bytes memory _reason) {
+                    emit EmergencyExitFailed(_strategy, _reason);
+                    continue;
+                }
+            }
+
+            emit EmergencyExit(_strategy, _released, _currentDebt - _released);
+        }
+
+        _redeployIdle(_startGas);
+    }
+
+    // hands idle to the healthiest strategies, highest priority then last seen APR
+    // first, until it is all placed or the emergency gas budget is spent
+    function _redeployIdle(uint256 _startGas) internal {
+        uint256 _toDeploy = _deployableIdle();
+        if (_toDeploy == 0) return;
+
+        uint256 _totalAssets = vault.totalAssets();
+        uint256 strategyCount = strategies.length;
+        bool[] memory _tried = new bool[](strategyCount);
+
+        while (_toDeploy > 0 && _startGas - gasleft() < emergencyGasBudget) {
+            uint256 _best = strategyCount;
+            StrategyConfig memory _bestConfig;
+            for (uint256 i; i < strategyCount; ++i) {
+                if (_tried[i]) continue;
+
+                StrategyConfig memory config = strategyConfigs[strategies[i]];
+                if (!config.enabled || config.exiting) continue;
+
+                if (
+                    _best == strategyCount ||
+                    config.priority > _bestConfig.priority ||
+                    (config.priority == _bestConfig.priority &&
+                        config.lastApr > _bestConfig.lastApr)
+                ) {
+                    _best = i;
+                    _bestConfig = config;
+                }
+            }
+
+            // no healthy strategy left
+            if (_best == strategyCount) return;
+            _tried[_best] = true;
+
+            address _strategy = strategies[_best];
+            IVault.StrategyParams memory params = vault.strategies(_strategy);
+            uint256 _maxDebt = Math.min(
+                params.max_debt,
+                _ceiling(_bestConfig, _totalAssets)
+            );
+            if (_maxDebt <= params.current_debt) continue;
+
+            uint256 _amount = Math.min(
+                _toDeploy,
+                _maxDebt - params.current_debt
+            );
+            vault.update_debt(_strategy, params.current_debt + _amount);
+            _toDeploy -= _amount;
+        }
+    }
+
+    function _deployableIdle() internal view returns (uint256) {
+        uint256 _totalIdle = vault.total_idle();
+        uint256 _minimumIdle = vault.minimum_total_idle();
+        return _totalIdle > _minimumIdle ? _totalIdle - _minimumIdle : 0;
+    }
+
+    function updateAllocations() public onlyRole(KEEPER) {
+        if (address(allocationPolicy) != address(0)) {
+            _applyTargets(allocationPolicy.targetDebts(address(this)));
+            return;
+        }
+
         (
             uint256 _lowest,
             uint256 _lowestApr,
@@ -57,34 +387,256 @@ contract LenderDebtManager {
         ) = estimateAdjustPosition();
 
         // only pull out if we can do better
-        if (_potential > _lowestApr) {
+        if (_potential > _lowestApr && _lowest != _highest) {
             address _lowestStrategy = strategies[_lowest];
 
             // harvest all profits
-            vault.tend_strategy(_lowestStrategy);
+            if (_needsTend(_lowestStrategy)) {
+                vault.tend_strategy(_lowestStrategy);
+            }
 
             // report to the vault so it doesnt leave anything behind
-            vault.process_report(_lowestStrategy);
+            if (_needsReport(_lowestStrategy)) {
+                vault.process_report(_lowestStrategy);
+            }
 
-            // update the debt down to 0
-            vault.update_debt(_lowestStrategy, 0);
+            // update the debt down to whatever the strategy can release
+            uint256 _currentDebt = vault
+                .strategies(_lowestStrategy)
+                .current_debt;
+            uint256 _toRelease = _releasable(
+                _lowestStrategy,
+                _currentDebt,
+                _floor(strategyConfigs[_lowestStrategy], vault.totalAssets())
+            );
+            if (_toRelease > 0) {
+                vault.update_debt(_lowestStrategy, _currentDebt - _toRelease);
+            }
+
+            _recordApr(_lowestStrategy, _lowestApr);
+            _observe(_lowestStrategy);
         }
 
         uint256 _totalIdle = vault.total_idle();
 
         // deposit all thats possible
         if (_totalIdle > 0) {
-            address _highestStrategy = strategies[_highest];
-            uint256 _highestCurrentDebt = vault
-                .strategies(_highestStrategy)
-                .current_debt;
+            if (idleSplitCount > 1) {
+                _distributeIdle(_totalIdle);
+            } else {
+                _depositIdle(strategies[_highest], _totalIdle, _potential);
+            }
 
-            vault.update_debt(
-                _highestStrategy,
-                _totalIdle + _highestCurrentDebt
+            lastBlockUpdate = block.timestamp;
+        }
+    }
+
+    // moves every strategy towards its target within what the config, max_debt
+    // and liquidity allow. Decreases go first so the idle they free funds the rest
+    function _applyTargets(uint256[] memory _targets) internal {
+        uint256 strategyCount = strategies.length;
+        require(_targets.length == strategyCount, "invalid targets");
+        uint256 totalAssets = vault.totalAssets();
+
+        for (uint256 i; i < strategyCount; ++i) {
+            address _strategy = strategies[i];
+            uint256 _currentDebt = vault.strategies(_strategy).current_debt;
+            if (_targets[i] >= _currentDebt) continue;
+
+            if (_needsTend(_strategy)) {
+                vault.tend_strategy(_strategy);
+            }
+            if (_needsReport(_strategy)) {
+                vault.process_report(_strategy);
+                _currentDebt = vault.strategies(_strategy).current_debt;
+            }
+
+            uint256 _toRelease = _releasable(
+                _strategy,
+                _currentDebt,
+                Math.max(
+                    _targets[i],
+                    _floor(strategyConfigs[_strategy], totalAssets)
+                )
             );
+            if (_toRelease == 0) continue;
 
-            lastBlockUpdate = block.timestamp;
+            vault.update_debt(_strategy, _currentDebt - _toRelease);
+            _recordApr(_strategy, _observe(_strategy));
+        }
+
+        uint256 _available = _deployableIdle();
+        for (uint256 i; i < strategyCount && _available > 0; ++i) {
+            address _strategy = strategies[i];
+            StrategyConfig memory config = strategyConfigs[_strategy];
+            if (!config.enabled || config.exiting) continue;
+
+            IVault.StrategyParams memory params = vault.strategies(_strategy);
+            uint256 _targetDebt = Math.min(
+                _targets[i],
+                Math.min(params.max_debt, _ceiling(config, totalAssets))
+            );
+            if (_targetDebt <= params.current_debt) continue;
+
+            uint256 _amount = Math.min(
+                _targetDebt - params.current_debt,
+                _available
+            );
+            vault.update_debt(_strategy, params.current_debt + _amount);
+            _available -= _amount;
+            _recordApr(_strategy, _observe(_strategy));
+        }
+
+        lastBlockUpdate = block.timestamp;
+    }
+
+    function _depositIdle(
+        address _highestStrategy,
+        uint256 _totalIdle,
+        uint256 _potential
+    ) internal {
+        StrategyConfig memory config = strategyConfigs[_highestStrategy];
+        // no strategy is enabled
+        if (!config.enabled) return;
+
+        uint256 _highestCurrentDebt = vault
+            .strategies(_highestStrategy)
+            .current_debt;
+        uint256 _targetDebt = Math.min(
+            _totalIdle + _highestCurrentDebt,
+            _ceiling(config, vault.totalAssets())
+        );
+        if (_targetDebt <= _highestCurrentDebt) return;
+
+        vault.update_debt(_highestStrategy, _targetDebt);
+        _recordApr(_highestStrategy, _potential);
+        _observe(_highestStrategy);
+    }
+
+    function _distributeIdle(uint256 _totalIdle) internal {
+        uint256 minimumIdle = vault.minimum_total_idle();
+        if (_totalIdle <= minimumIdle) return;
+
+        (address[] memory _targets, uint256[] memory _amounts) = _splitIdle(
+            _totalIdle - minimumIdle
+        );
+
+        for (uint256 i; i < _targets.length; ++i) {
+            if (_amounts[i] == 0) continue;
+
+            uint256 _currentDebt = vault.strategies(_targets[i]).current_debt;
+            vault.update_debt(_targets[i], _currentDebt + _amounts[i]);
+            _recordApr(_targets[i], _observe(_targets[i]));
+        }
+    }
+
+    // how the idle that can be deployed would be split across strategies right now
+    function estimateIdleSplit()
+        external
+        view
+        returns (address[] memory _targets, uint256[] memory _amounts)
+    {
+        uint256 _totalIdle = vault.total_idle();
+        uint256 minimumIdle = vault.minimum_total_idle();
+        if (_totalIdle <= minimumIdle) {
+            return (new address[](0), new uint256[](0));
+        }
+
+        return _splitIdle(_totalIdle - minimumIdle);
+    }
+
+    // takes the idleSplitCount strategies with the best APR, then hands _amount out
+    // one chunk at a time to whichever of them pays the most after receiving it
+    function _splitIdle(
+        uint256 _amount
+    )
+        internal
+        view
+        returns (address[] memory _targets, uint256[] memory _amounts)
+    {
+        _targets = _topStrategies(idleSplitCount);
+        uint256 k = _targets.length;
+        _amounts = new uint256[](k);
+
+        // room left under each max_debt and max allocation
+        uint256 totalAssets = vault.totalAssets();
+        uint256[] memory _room = new uint256[](k);
+        for (uint256 j; j < k; ++j) {
+            IVault.StrategyParams memory params = vault.strategies(
+                _targets[j]
+            );
+            uint256 _maxDebt = Math.min(
+                params.max_debt,
+                _ceiling(strategyConfigs[_targets[j]], totalAssets)
+            );
+            if (_maxDebt > params.current_debt) {
+                _room[j] = _maxDebt - params.current_debt;
+            }
+        }
+
+        uint256 chunk = _amount / idleChunks;
+        if (chunk == 0) chunk = _amount;
+
+        uint256 remaining = _amount;
+        while (remaining > 0) {
+            uint256 best = k;
+            uint256 bestApr;
+            uint256 bestSize;
+            for (uint256 j; j < k; ++j) {
+                uint256 size = Math.min(Math.min(chunk, remaining), _room[j]);
+                if (size == 0) continue;
+
+                uint256 apr = ILenderStrategy(_targets[j]).aprAfterDebtChange(
+                    SafeCast.toInt256(_amounts[j] + size)
+                );
+                if (best == k || apr > bestApr) {
+                    best = j;
+                    bestApr = apr;
+                    bestSize = size;
+                }
+            }
+
+            // every candidate is at its max debt
+            if (best == k) break;
+
+            _amounts[best] += bestSize;
+            _room[best] -= bestSize;
+            remaining -= bestSize;
+        }
+    }
+
+    // enabled strategies with the best current APR, best first
+    function _topStrategies(
+        uint256 _count
+    ) internal view returns (address[] memory _targets) {
+        uint256 strategyCount = strategies.length;
+        uint256 k = Math.min(_count, strategyCount);
+        _targets = new address[](k);
+        uint256[] memory _aprs = new uint256[](k);
+
+        uint256 filled;
+        for (uint256 i; i < strategyCount && k > 0; ++i) {
+            address _strategy = strategies[i];
+            if (!strategyConfigs[_strategy].enabled) continue;
+
+            uint256 apr = ILenderStrategy(_strategy).aprAfterDebtChange(
+                int256(0)
+            );
+            if (filled == k && apr <= _aprs[k - 1]) continue;
+
+            uint256 j = filled < k ? filled++ : k - 1;
+            while (j > 0 && _aprs[j - 1] < apr) {
+                _aprs[j] = _aprs[j - 1];
+                _targets[j] = _targets[j - 1];
+                --j;
+            }
+            _aprs[j] = apr;
+            _targets[j] = _strategy;
+        }
+
+        // fewer enabled strategies than requested
+        assembly {
+            mstore(_targets, filled)
         }
     }
 
@@ -105,6 +657,10 @@ contract LenderDebtManager {
         }
 
         if (strategyCount == 1) {
+            if (!strategyConfigs[strategies[0]].enabled) {
+                return (0, type(uint256).max, 0, 0);
+            }
+
             ILenderStrategy _strategy = ILenderStrategy(strategies[0]);
             uint256 apr = _strategy.aprAfterDebtChange(int256(0));
             return (0, apr, 0, apr);
@@ -112,47 +668,344 @@ contract LenderDebtManager {
 
         //all loose assets are to be invested
         uint256 looseAssets = vault.total_idle();
+        uint256 totalAssets = vault.totalAssets();
+
+        // read every config and debt once for both loops
+        StrategyConfig[] memory configs = new StrategyConfig[](strategyCount);
+        uint256[] memory navs = new uint256[](strategyCount);
 
         // our simple algo
         // get the lowest apr strat
         // cycle through and see who could take its funds plus want for the highest apr
+        uint256 lowestNav;
+        (_lowest, _lowestApr, lowestNav) = _findLowest(
+            configs,
+            navs,
+            totalAssets
+        );
+
+        (_highest, _potential) = _findHighest(
+            configs,
+            navs,
+            totalAssets,
+            _lowest,
+            looseAssets,
+            lowestNav + looseAssets
+        );
+    }
+
+    function _findLowest(
+        StrategyConfig[] memory _configs,
+        uint256[] memory _navs,
+        uint256 _totalAssets
+    )
+        internal
+        view
+        returns (uint256 _lowest, uint256 _lowestApr, uint256 _lowestNav)
+    {
         _lowestApr = type(uint256).max;
-        _lowest = 0;
-        uint256 lowestNav = 0;
-        for (uint256 i; i < strategyCount; ++i) {
-            ILenderStrategy _strategy = ILenderStrategy(strategies[i]);
-            uint256 _strategyNav = vault
-                .strategies(address(_strategy))
-                .current_debt;
-            if (_strategyNav > 0) {
-                uint256 apr = _strategy.aprAfterDebtChange(int256(0));
-                if (apr < _lowestApr) {
-                    _lowestApr = apr;
-                    _lowest = i;
-                    lowestNav = _strategyNav;
-                }
+        for (uint256 i; i < _configs.length; ++i) {
+            address _strategy = strategies[i];
+            _configs[i] = strategyConfigs[_strategy];
+            if (!_configs[i].enabled) continue;
+
+            uint256 _strategyNav = vault.strategies(_strategy).current_debt;
+            _navs[i] = _strategyNav;
+            if (_strategyNav == 0) continue;
+
+            uint256 apr = _currentApr(_strategy);
+            if (
+                apr < _lowestApr ||
+                (apr == _lowestApr &&
+                    _configs[i].priority < _configs[_lowest].priority)
+            ) {
+                // only what can leave the strategy right now can be moved,
+                // and never below its minimum allocation
+                uint256 releasable = _releasable(
+                    _strategy,
+                    _strategyNav,
+                    _floor(_configs[i], _totalAssets)
+                );
+                if (releasable == 0) continue;
+
+                _lowestApr = apr;
+                _lowest = i;
+                _lowestNav = releasable;
             }
         }
+    }
 
-        uint256 toAdd = lowestNav + looseAssets;
+    function _findHighest(
+        StrategyConfig[] memory _configs,
+        uint256[] memory _navs,
+        uint256 _totalAssets,
+        uint256 _lowest,
+        uint256 _looseAssets,
+        uint256 _toAdd
+    ) internal view returns (uint256 _highest, uint256 _potential) {
+        for (uint256 i; i < _configs.length; ++i) {
+            if (!_configs[i].enabled) continue;
 
-        uint256 highestApr = 0;
-        _highest = 0;
+            // no room left under its max allocation
+            uint256 room = _ceiling(_configs[i], _totalAssets);
+            if (_navs[i] >= room) continue;
+            room -= _navs[i];
 
-        for (uint256 i; i < strategyCount; ++i) {
-            ILenderStrategy _strategy = ILenderStrategy(strategies[i]);
-            uint256 apr = _strategy.aprAfterDebtChange(int256(toAdd));
+            // the lowest gets its own funds back, so it only grows by the loose assets
+            uint256 apr = ILenderStrategy(strategies[i]).aprAfterDebtChange(
+                SafeCast.toInt256(
+                    Math.min(i == _lowest ? _looseAssets : _toAdd, room)
+                )
+            );
+            // a one block spike can't lift the potential above the recent average
+            if (twapWindow != 0) {
+                apr = Math.min(apr, twapApr(strategies[i], twapWindow));
+            }
 
-            if (apr > highestApr) {
-                highestApr = apr;
+            if (
+                apr > _potential ||
+                (apr == _potential &&
+                    _configs[i].priority > _configs[_highest].priority)
+            ) {
                 _highest = i;
                 _potential = apr;
             }
         }
     }
 
+    function _floor(
+        StrategyConfig memory _config,
+        uint256 _totalAssets
+    ) internal pure returns (uint256) {
+        return (_totalAssets * _config.minAllocationBps) / MAX_BPS;
+    }
+
+    function _ceiling(
+        StrategyConfig memory _config,
+        uint256 _totalAssets
+    ) internal pure returns (uint256) {
+        return (_totalAssets * _config.maxAllocationBps) / MAX_BPS;
+    }
+
+    function _releasable(
+        address _strategy,
+        uint256 _currentDebt,
+        uint256 _minimumDebt
+    ) internal view returns (uint256) {
+        if (_currentDebt <= _minimumDebt) return 0;
+
+        return
+            Math.min(
+                _currentDebt - _minimumDebt,
+                ILenderStrategy(_strategy).maxWithdraw(address(vault))
+            );
+    }
+
+    // how much debt each strategy could hand back to the vault right now
+    function getReleasableDebts()
+        external
+        view
+        returns (address[] memory, uint256[] memory _releasableDebts)
+    {
+        uint256 strategyCount = strategies.length;
+        uint256 totalAssets = vault.totalAssets();
+        _releasableDebts = new uint256[](strategyCount);
+        for (uint256 i; i < strategyCount; ++i) {
+            address _strategy = strategies[i];
+            _releasableDebts[i] = _releasable(
+                _strategy,
+                vault.strategies(_strategy).current_debt,
+                _floor(strategyConfigs[_strategy], totalAssets)
+            );
+        }
+
+        return (strategies, _releasableDebts);
+    }
+
+    function _recordApr(address _strategy, uint256 _apr) internal {
+        strategyConfigs[_strategy].lastApr = uint96(
+            Math.min(_apr, type(uint96).max)
+        );
+    }
+
+    function _currentApr(address _strategy) internal view returns (uint256) {
+        if (twapWindow == 0) {
+            return ILenderStrategy(_strategy).aprAfterDebtChange(int256(0));
+        }
+        return twapApr(_strategy, twapWindow);
+    }
+
+    // time weighted APR over the last _window seconds, or over the recorded
+    // history when it is shorter. Falls back to the spot APR with no history
+    function twapApr(
+        address _strategy,
+        uint256 _window
+    ) public view returns (uint256) {
+        StrategyConfig memory config = strategyConfigs[_strategy];
+        if (_window == 0 || config.observationCount == 0) {
+            return ILenderStrategy(_strategy).aprAfterDebtChange(int256(0));
+        }
+
+        Observation[OBSERVATION_CARDINALITY] storage ring = observations[
+            _strategy
+        ];
+        Observation memory last = ring[config.observationIndex];
+        uint256 target = block.timestamp > _window
+            ? block.timestamp - _window
+            : 0;
+
+        // walk back to the newest observation at or before the window start
+        Observation memory start = last;
+        uint256 index = config.observationIndex;
+        for (
+            uint256 n = 1;
+            n < config.observationCount && start.timestamp > target;
+            ++n
+        ) {
+            index =
+                (index + OBSERVATION_CARDINALITY - 1) %
+                OBSERVATION_CARDINALITY;
+            start = ring[index];
+        }
+
+        if (start.timestamp > target) target = start.timestamp;
+        if (target == block.timestamp) return last.apr;
+
+        unchecked {
+            uint128 cumulativeNow = last.aprCumulative +
+                uint128(last.apr) *
+                uint128(block.timestamp - last.timestamp);
+            uint128 cumulativeStart = start.aprCumulative +
+                uint128(start.apr) *
+                uint128(target - start.timestamp);
+            return
+                uint256(cumulativeNow - cumulativeStart) /
+                (block.timestamp - target);
+        }
+    }
+
+    // recorded APR observations of a strategy, oldest first
+    function getObservations(
+        address _strategy
+    ) external view returns (Observation[] memory _observations) {
+        StrategyConfig memory config = strategyConfigs[_strategy];
+        uint256 count = config.observationCount;
+        _observations = new Observation[](count);
+        // the oldest one sits right after the latest once the ring is full
+        uint256 first = config.observationIndex +
+            OBSERVATION_CARDINALITY +
+            1 -
+            count;
+        for (uint256 i; i < count; ++i) {
+            _observations[i] = observations[_strategy][
+                (first + i) % OBSERVATION_CARDINALITY
+            ];
+        }
+    }
+
+    // pushes the current spot APR and returns it, one SSTORE unless the slot is new
+    function _observe(address _strategy) internal returns (uint256 _apr) {
+        StrategyConfig storage config = strategyConfigs[_strategy];
+        Observation[OBSERVATION_CARDINALITY] storage ring = observations[
+            _strategy
+        ];
+        uint96 apr = uint96(
+            Math.min(
+                ILenderStrategy(_strategy).aprAfterDebtChange(int256(0)),
+                type(uint96).max
+            )
+        );
+        _apr = apr;
+
+        uint8 index = config.observationIndex;
+        uint8 count = config.observationCount;
+        if (count == 0) {
+            ring[index] = Observation(uint32(block.timestamp), apr, 0);
+        } else {
+            Observation memory last = ring[index];
+            // already observed this block, the newer APR holds from now on
+            if (last.timestamp == block.timestamp) {
+                ring[index].apr = apr;
+                return;
+            }
+
+            uint128 cumulative;
+            unchecked {
+                cumulative =
+                    last.aprCumulative +
+                    uint128(last.apr) *
+                    uint128(block.timestamp - last.timestamp);
+            }
+            index = uint8((index + 1) % OBSERVATION_CARDINALITY);
+            ring[index] = Observation(
+                uint32(block.timestamp),
+                apr,
+                cumulative
+            );
+        }
+
+        config.observationIndex = index;
+        if (count < OBSERVATION_CARDINALITY) {
+            config.observationCount = count + 1;
+        }
+    }
+
+    // strategies without a tendTrigger are always tended
+    function _needsTend(address _strategy) internal view returns (bool) {
+        try ILenderStrategy(_strategy).tendTrigger() returns (bool _trigger) {
+            return _trigger;
+        } catch {
+            return true;
+        }
+    }
+
+    // nothing to realise if reported this block or assets still match the debt
+    function _needsReport(address _strategy) internal view returns (bool) {
+        IVault.StrategyParams memory params = vault.strategies(_strategy);
+        if (params.last_report == block.timestamp) return false;
+
+        ILenderStrategy _lender = ILenderStrategy(_strategy);
+        return
+            _lender.convertToAssets(_lender.balanceOf(address(vault))) !=
+            params.current_debt;
+    }
+
+    function _isManaged(address _strategy) internal view returns (bool) {
+        for (uint256 i = 0; i < strategies.length; ++i) {
+            if (strategies[i] == _strategy) return true;
+        }
+        return false;
+    }
+
+    // APR of a strategy once _amount of its debt is withdrawn, capped at its current debt
+    function aprAfterDebtRemoval(
+        address _strategy,
+        uint256 _amount
+    ) external view returns (uint256) {
+        uint256 currentDebt = vault.strategies(_strategy).current_debt;
+        return
+            ILenderStrategy(_strategy).aprAfterDebtChange(
+                -SafeCast.toInt256(Math.min(_amount, currentDebt))
+            );
+    }
+
     // External function get the full array of strategies
     function getStrategies() external view returns (address[] memory) {
         return strategies;
     }
+
+    // External function get every strategy with its config in one call
+    function getStrategyConfigs()
+        external
+        view
+        returns (address[] memory, StrategyConfig[] memory _configs)
+    {
+        uint256 strategyCount = strategies.length;
+        _configs = new StrategyConfig[](strategyCount);
+        for (uint256 i; i < strategyCount; ++i) {
+            _configs[i] = strategyConfigs[strategies[i]];
+        }
+
+        return (strategies, _configs);
+    }
 }
@@ -0,0 +1,159 @@
+// SPDX-License-Identifier: AGPL-3.0
+pragma solidity 0.8.14;
+
+import "./LenderDebtManager.sol";
+import "./interfaces/IAllocationPolicy.sol";
+import "./interfaces/IVault.sol";
+import "@openzeppelin/contracts/utils/math/Math.sol";
+import "@openzeppelin/contracts/utils/math/SafeCast.sol";
+
+// Hands out everything the vault can deploy one chunk at a time, each chunk to
+// the strategy paying the most once it holds it. Where the built-in policy moves
+// the funds of one strategy per call, this one lands every strategy near the
+// same marginal APR at once
+contract MarginalAprPolicy is IAllocationPolicy {
+    uint256 internal constant MAX_BPS = 10_000;
+    uint256 public constant MAX_CHUNKS = 100;
+
+    // more chunks get closer to the optimum, each costs one aprAfterDebtChange
+    uint256 public immutable chunks;
+
+    constructor(uint256 _chunks) {
+        require(_chunks > 0 && _chunks <= MAX_CHUNKS, "invalid chunks");
+        chunks = _chunks;
+    }
+
+    function targetDebts(
+        address _debtManager
+    ) external view returns (uint256[] memory _targets) {
+        LenderDebtManager debtManager = LenderDebtManager(_debtManager);
+        (
+            address[] memory _strategies,
+            LenderDebtManager.StrategyConfig[] memory _configs
+        ) = debtManager.getStrategyConfigs();
+
+        uint256[] memory _currents;
+        uint256[] memory _room;
+        uint256 _toDeploy;
+        (_targets, _currents, _room, _toDeploy) = _startingPoint(
+            debtManager.vault(),
+            _strategies,
+            _configs
+        );
+        _fill(_strategies, _targets, _currents, _room, _toDeploy);
+    }
+
+    // every strategy at its minimum allocation, and what is left to hand out
+    function _startingPoint(
+        IVault _vault,
+        address[] memory _strategies,
+        LenderDebtManager.StrategyConfig[] memory _configs
+    )
+        internal
+        view
+        returns (
+            uint256[] memory _targets,
+            uint256[] memory _currents,
+            uint256[] memory _room,
+            uint256 _toDeploy
+        )
+    {
+        uint256 strategyCount = _strategies.length;
+        _targets = new uint256[](strategyCount);
+        _currents = new uint256[](strategyCount);
+        _room = new uint256[](strategyCount);
+
+        uint256 totalAssets = _vault.totalAssets();
+        uint256 minimumIdle = _vault.minimum_total_idle();
+        _toDeploy = totalAssets > minimumIdle ? totalAssets - minimumIdle : 0;
+
+        for (uint256 i; i < strategyCount; ++i) {
+            IVault.StrategyParams memory params = _vault.strategies(
+                _strategies[i]
+            );
+            _currents[i] = params.current_debt;
+
+            // left as they are, an emergency exit is draining them or they are off
+            if (!_configs[i].enabled || _configs[i].exiting) {
+                _targets[i] = params.current_debt;
+            } else {
+                uint256 ceiling = Math.min(
+                    params.max_debt,
+                    (totalAssets * _configs[i].maxAllocationBps) / MAX_BPS
+                );
+                _targets[i] = Math.min(
+                    (totalAssets * _configs[i].minAllocationBps) / MAX_BPS,
+                    ceiling
+                );
+                _room[i] = ceiling - _targets[i];
+            }
+            _toDeploy -= Math.min(_toDeploy, _targets[i]);
+        }
+    }
+
+    // only the strategy that just took a chunk is priced again, the others keep
+    // the APR of their next chunk from the round before. A call makes about
+    // 2 * strategies + chunks aprAfterDebtChange, not one per strategy a round
+    function _fill(
+        address[] memory _strategies,
+        uint256[] memory _targets,
+        uint256[] memory _currents,
+        uint256[] memory _room,
+        uint256 _toDeploy
+    ) internal view {
+        uint256 k = _strategies.length;
+        uint256 chunk = _toDeploy / chunks;
+        if (chunk == 0) chunk = _toDeploy;
+
+        // APR of each strategy once given its next chunk, 0 sized when full
+        uint256[] memory _aprs = new uint256[](k);
+        uint256[] memory _sizes = new uint256[](k);
+        for (uint256 j; j < k; ++j) {
+            _sizes[j] = Math.min(Math.min(chunk, _toDeploy), _room[j]);
+            if (_sizes[j] > 0) {
+                _aprs[j] = _aprAfter(
+                    _strategies[j],
+                    _targets[j] + _sizes[j],
+                    _currents[j]
+                );
+            }
+        }
+
+        while (_toDeploy > 0) {
+            uint256 best = k;
+            for (uint256 j; j < k; ++j) {
+                if (_sizes[j] == 0) continue;
+                if (best == k || _aprs[j] > _aprs[best]) best = j;
+            }
+
+            // every strategy is at its max debt
+            if (best == k) break;
+
+            // the last piece can be smaller than the chunk it was priced for
+            uint256 size = Math.min(_sizes[best], _toDeploy);
+            _targets[best] += size;
+            _room[best] -= size;
+            _toDeploy -= size;
+
+            _sizes[best] = Math.min(Math.min(chunk, _toDeploy), _room[best]);
+            if (_sizes[best] > 0) {
+                _aprs[best] = _aprAfter(
+                    _strategies[best],
+                    _targets[best] + _sizes[best],
+                    _currents[best]
+                );
+            }
+        }
+    }
+
+    function _aprAfter(
+        address _strategy,
+        uint256 _target,
+        uint256 _current
+    ) internal view returns (uint256) {
+        return
+            ILenderStrategy(_strategy).aprAfterDebtChange(
+                SafeCast.toInt256(_target) - SafeCast.toInt256(_current)
+            );
+    }
+}
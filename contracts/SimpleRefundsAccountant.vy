@@ -23,12 +23,15 @@ event AcceptFeeManager:
     fee_manager: address
 
 event UpdatePerformanceFee:
+    strategy: indexed(address)
     performance_fee: uint256
 
 event UpdateManagementFee:
+    strategy: indexed(address)
     management_fee: uint256
 
 event DistributeRewards:
+    vault: indexed(address)
     rewards: uint256
 
 
@@ -71,7 +74,7 @@ def distribute(vault: address):
     assert msg.sender == self.fee_manager, "not fee manager"
     rewards: uint256 = IVault(vault).balanceOf(self)
     IVault(vault).transfer(msg.sender, rewards)
-    log DistributeRewards(rewards)
+    log DistributeRewards(vault, rewards)
 
 
 @external
@@ -79,7 +82,7 @@ def set_performance_fee(strategy: address, performance_fee: uint256):
     assert msg.sender == self.fee_manager, "not fee manager"
     assert performance_fee <= self._performance_fee_threshold(), "exceeds performance fee threshold"
     self.fees[strategy].performance_fee = performance_fee
-    log UpdatePerformanceFee(performance_fee)
+    log UpdatePerformanceFee(strategy, performance_fee)
 
 
 @external
@@ -87,7 +90,7 @@ def set_management_fee(strategy: address, management_fee: uint256):
     assert msg.sender == self.fee_manager, "not fee manager"
     assert management_fee <= self._management_fee_threshold(), "exceeds management fee threshold"
     self.fees[strategy].management_fee = management_fee
-    log UpdateManagementFee(management_fee)
+    log UpdateManagementFee(strategy, management_fee)
 
 
 @external
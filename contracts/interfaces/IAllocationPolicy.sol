@@ -0,0 +1,11 @@
+// SPDX-License-Identifier: GPL-3.0
+pragma solidity 0.8.14;
+
+// decides where the funds of a debt manager's vault should go, the debt
+// manager only moves them
+interface IAllocationPolicy {
+    // target debt of every strategy of the debt manager, in getStrategies order
+    function targetDebts(
+        address _debtManager
+    ) external view returns (uint256[] memory _targets);
+}
@@ -21,6 +21,10 @@ interface IVault {
     // Current assets held in the vault contract. Replacing balanceOf(this) to avoid price_per_share manipulation
     function total_idle() external view returns (uint256);
 
+    function minimum_total_idle() external view returns (uint256);
+
+    function totalAssets() external view returns (uint256);
+
     function update_debt(
         address strategy,
         uint256 target_debt
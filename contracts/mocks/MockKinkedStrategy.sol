@@ -0,0 +1,78 @@
+// SPDX-License-Identifier: AGPL-3.0
+pragma solidity 0.8.14;
+
+import "./MockLenderStrategy.sol";
+
+// Aave/Compound style lender: the borrow rate follows a utilisation curve with a
+// kink, and suppliers earn the borrow rate times utilisation
+contract MockKinkedStrategy is MockLenderStrategy {
+    uint256 constant PRECISION = 1e18;
+
+    uint256 public baseRate;
+    uint256 public slope1;
+    uint256 public slope2;
+    // utilisation at which slope2 kicks in, 1e18 = 100%
+    uint256 public kink;
+
+    // assets borrowed from / supplied to the market by everyone else
+    uint256 public borrowed;
+    uint256 public otherSupply;
+
+    constructor(
+        address _vault,
+        string memory _name,
+        uint256 _baseRate,
+        uint256 _slope1,
+        uint256 _slope2,
+        uint256 _kink,
+        uint256 _borrowed,
+        uint256 _otherSupply
+    ) MockLenderStrategy(_vault, _name) {
+        require(_kink > 0 && _kink < PRECISION, "invalid kink");
+        baseRate = _baseRate;
+        slope1 = _slope1;
+        slope2 = _slope2;
+        kink = _kink;
+        borrowed = _borrowed;
+        otherSupply = _otherSupply;
+    }
+
+    function setMarket(uint256 _borrowed, uint256 _otherSupply) external {
+        borrowed = _borrowed;
+        otherSupply = _otherSupply;
+    }
+
+    function utilisation(uint256 _assets) public view returns (uint256) {
+        uint256 supply = otherSupply + _assets;
+        // saturate at 100% when borrows exceed what is supplied
+        if (borrowed >= supply) return PRECISION;
+        return (borrowed * PRECISION) / supply;
+    }
+
+    function _aprAt(uint256 _assets) internal view override returns (uint256) {
+        if (otherSupply + _assets == 0) return 0;
+
+        uint256 _utilisation = utilisation(_assets);
+        uint256 borrowRate;
+        if (_utilisation <= kink) {
+            borrowRate = baseRate + (slope1 * _utilisation) / kink;
+        } else {
+            borrowRate =
+                baseRate +
+                slope1 +
+                (slope2 * (_utilisation - kink)) /
+                (PRECISION - kink);
+        }
+
+        return (borrowRate * _utilisation) / PRECISION;
+    }
+
+    // only the market's cash (supply not borrowed) can be withdrawn
+    function _maxWithdraw(
+        address owner
+    ) internal view override returns (uint256) {
+        uint256 supply = otherSupply + _totalAssets();
+        uint256 cash = supply > borrowed ? supply - borrowed : 0;
+        return Math.min(super._maxWithdraw(owner), cash);
+    }
+}
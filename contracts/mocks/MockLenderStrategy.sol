@@ -0,0 +1,88 @@
+// SPDX-License-Identifier: AGPL-3.0
+pragma solidity 0.8.14;
+
+import {Math} from "@openzeppelin/contracts/utils/math/Math.sol";
+
+import "../interfaces/IVault.sol";
+import "./BaseStrategy.sol";
+
+// Lender with a pluggable APR curve and a limited amount of withdrawable liquidity
+abstract contract MockLenderStrategy is BaseStrategy {
+    uint256 constant MAX_BPS = 10_000;
+
+    // assets that can leave the lender right now, unlimited by default
+    uint256 public liquidity = type(uint256).max;
+    // when set, asking how much can be withdrawn reverts
+    bool public broken;
+
+    constructor(
+        address _vault,
+        string memory _name
+    ) BaseStrategy(_vault, _name) {}
+
+    function aprAfterDebtChange(int256 delta) external view returns (uint256) {
+        return _aprAt(_assetsAfterDebtChange(delta));
+    }
+
+    function setLiquidity(uint256 _liquidity) external {
+        liquidity = _liquidity;
+    }
+
+    function setBroken(bool _broken) external {
+        broken = _broken;
+    }
+
+    function _assetsAfterDebtChange(
+        int256 _delta
+    ) internal view returns (uint256) {
+        uint256 assets = _totalAssets();
+        if (_delta >= 0) return assets + uint256(_delta);
+
+        // negating type(int256).min would overflow, so shift by one
+        uint256 removed = uint256(-(_delta + 1)) + 1;
+        // can't remove more than what is supplied
+        return removed < assets ? assets - removed : 0;
+    }
+
+    // APR the lender would pay with `_assets` supplied by this strategy
+    function _aprAt(uint256 _assets) internal view virtual returns (uint256);
+
+    function _maxWithdraw(
+        address owner
+    ) internal view virtual override returns (uint256) {
+        require(!broken, "broken lender");
+        return Math.min(_totalAssets(), liquidity);
+    }
+
+    function _freeFunds(
+        uint256 _amount
+    ) internal returns (uint256 _amountFreed) {
+        uint256 looseAsset = balanceOfAsset();
+        if (_amount >= looseAsset) {
+            return looseAsset;
+        } else {
+            return _amount;
+        }
+    }
+
+    function _withdraw(
+        uint256 amount,
+        address receiver,
+        address owner
+    ) internal override returns (uint256 _amountFreed) {
+        _amountFreed = _freeFunds(amount);
+        if (liquidity != type(uint256).max) {
+            liquidity -= _amountFreed;
+        }
+    }
+
+    function _totalAssets() internal view override returns (uint256) {
+        return balanceOfAsset();
+    }
+
+    function _invest() internal override {}
+
+    function balanceOfAsset() internal view returns (uint256) {
+        return IERC20(asset).balanceOf(address(this));
+    }
+}
@@ -0,0 +1,74 @@
+// SPDX-License-Identifier: AGPL-3.0
+pragma solidity 0.8.14;
+
+import "./MockLenderStrategy.sol";
+
+// Lender whose APR is linearly interpolated between (assets, apr) points and
+// stays flat outside of them
+contract MockPiecewiseStrategy is MockLenderStrategy {
+    uint256[] public assetsPoints;
+    uint256[] public aprPoints;
+
+    constructor(
+        address _vault,
+        string memory _name,
+        uint256[] memory _assetsPoints,
+        uint256[] memory _aprPoints
+    ) MockLenderStrategy(_vault, _name) {
+        _setCurve(_assetsPoints, _aprPoints);
+    }
+
+    function setCurve(
+        uint256[] memory _assetsPoints,
+        uint256[] memory _aprPoints
+    ) external {
+        _setCurve(_assetsPoints, _aprPoints);
+    }
+
+    function getCurve()
+        external
+        view
+        returns (uint256[] memory, uint256[] memory)
+    {
+        return (assetsPoints, aprPoints);
+    }
+
+    function _setCurve(
+        uint256[] memory _assetsPoints,
+        uint256[] memory _aprPoints
+    ) internal {
+        require(
+            _assetsPoints.length > 0 &&
+                _assetsPoints.length == _aprPoints.length,
+            "invalid curve"
+        );
+        for (uint256 i = 1; i < _assetsPoints.length; ++i) {
+            require(
+                _assetsPoints[i] > _assetsPoints[i - 1],
+                "points not sorted"
+            );
+        }
+
+        assetsPoints = _assetsPoints;
+        aprPoints = _aprPoints;
+    }
+
+    function _aprAt(uint256 _assets) internal view override returns (uint256) {
+        uint256 pointCount = assetsPoints.length;
+        if (_assets <= assetsPoints[0]) return aprPoints[0];
+        if (_assets >= assetsPoints[pointCount - 1]) {
+            return aprPoints[pointCount - 1];
+        }
+
+        uint256 i = 1;
+        while (assetsPoints[i] < _assets) ++i;
+
+        uint256 x0 = assetsPoints[i - 1];
+        uint256 x1 = assetsPoints[i];
+        uint256 y0 = aprPoints[i - 1];
+        uint256 y1 = aprPoints[i];
+
+        if (y1 >= y0) return y0 + ((y1 - y0) * (_assets - x0)) / (x1 - x0);
+        return y0 - ((y0 - y1) * (_assets - x0)) / (x1 - x0);
+    }
+}
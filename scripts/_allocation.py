@@ -0,0 +1,168 @@
+"""
+Off-chain models of the lender APR curves and of the best achievable allocation.
+
+APRs use the same 1e18 = 100% precision as ``aprAfterDebtChange`` so the
+numbers can be compared one to one with what the strategies report on chain.
+"""
+import random
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+MAX_BPS = 10_000
+APR_PRECISION = 10**18
+
+
+@dataclass(frozen=True)
+class LinearCurve:
+    """Mirror of ``MockStrategy``: ``base - slope * assets / MAX_BPS``."""
+
+    base: int
+    slope: int
+
+    def apr(self, assets: int) -> int:
+        drop = self.slope * assets // MAX_BPS
+        return self.base - drop if drop < self.base else 0
+
+
+@dataclass(frozen=True)
+class KinkedCurve:
+    """Mirror of ``MockKinkedStrategy``: supply rate of a kinked utilisation market."""
+
+    base_rate: int
+    slope1: int
+    slope2: int
+    kink: int
+    borrowed: int
+    other_supply: int
+
+    def utilisation(self, assets: int) -> int:
+        supply = self.other_supply + assets
+        if self.borrowed >= supply:
+            return APR_PRECISION
+        return self.borrowed * APR_PRECISION // supply
+
+    def apr(self, assets: int) -> int:
+        if self.other_supply + assets == 0:
+            return 0
+
+        utilisation = self.utilisation(assets)
+        if utilisation <= self.kink:
+            borrow_rate = self.base_rate + self.slope1 * utilisation // self.kink
+        else:
+            borrow_rate = (
+                self.base_rate
+                + self.slope1
+                + self.slope2 * (utilisation - self.kink) // (APR_PRECISION - self.kink)
+            )
+
+        return borrow_rate * utilisation // APR_PRECISION
+
+
+@dataclass(frozen=True)
+class PiecewiseCurve:
+    """Mirror of ``MockPiecewiseStrategy``: interpolated ``(assets, apr)`` points."""
+
+    points: Tuple[Tuple[int, int], ...]
+
+    def apr(self, assets: int) -> int:
+        if assets <= self.points[0][0]:
+            return self.points[0][1]
+        if assets >= self.points[-1][0]:
+            return self.points[-1][1]
+
+        i = 1
+        while self.points[i][0] < assets:
+            i += 1
+
+        (x0, y0), (x1, y1) = self.points[i - 1], self.points[i]
+        if y1 >= y0:
+            return y0 + (y1 - y0) * (assets - x0) // (x1 - x0)
+        return y0 - (y0 - y1) * (assets - x0) // (x1 - x0)
+
+
+def random_curves(rng: random.Random, count: int, decimals: int) -> List[LinearCurve]:
+    # 2% to 10% base APR, losing 1% to 5% for every million deposited
+    million = 10**6 * 10**decimals
+    return [
+        LinearCurve(
+            base=rng.randint(2, 10) * APR_PRECISION // 100,
+            slope=rng.randint(1, 5) * APR_PRECISION // 100 * 10_000 // million,
+        )
+        for _ in range(count)
+    ]
+
+
+def annual_yield(curve, assets: int) -> int:
+    return assets * curve.apr(assets) // APR_PRECISION
+
+
+def blended_apr(curves: Sequence, debts: Sequence[int], idle: int = 0) -> int:
+    """Debt-weighted APR of the whole vault, idle assets earning nothing."""
+    total = sum(debts) + idle
+    if total == 0:
+        return 0
+
+    earned = sum(annual_yield(curve, debt) for curve, debt in zip(curves, debts))
+    return earned * APR_PRECISION // total
+
+
+def optimal_allocation(
+    curves: Sequence,
+    total: int,
+    chunks: int = 1_000,
+    caps: Optional[Sequence[int]] = None,
+) -> List[int]:
+    """
+    Split up to ``total`` across ``curves`` maximising the yearly yield. What
+    no lender pays anything for is left out, as idle it earns nothing either.
+
+    Yields are sampled every ``total / chunks`` up to each cap. They aren't
+    concave in general: a linear lender stops yielding once its APR reaches 0,
+    and kinked or piecewise rates can rise with supply. Each lender is replaced
+    by the upper concave envelope of its samples, and the envelope segments are
+    handed out steepest first while they still gain. That is the optimum on
+    the grid, except for the one segment the budget may cut short.
+    """
+    allocation = [0] * len(curves)
+    if total == 0 or len(curves) == 0:
+        return allocation
+
+    caps = caps or [total] * len(curves)
+    chunk = max(total // chunks, 1)
+
+    segments = []
+    for i, curve in enumerate(curves):
+        end = min(caps[i], total)
+        points = [(x, annual_yield(curve, x)) for x in range(0, end, chunk)]
+        points.append((end, annual_yield(curve, end)))
+        hull = _upper_hull(points)
+        for (x0, y0), (x1, y1) in zip(hull, hull[1:]):
+            if y1 <= y0:
+                break
+            segments.append(((y1 - y0) / (x1 - x0), i, x0, x1))
+
+    # a lender's segments get flatter along its envelope, so they come in order
+    segments.sort(key=lambda segment: (-segment[0], segment[1], segment[2]))
+
+    remaining = total
+    for _, i, start, end in segments:
+        if remaining == 0:
+            break
+        size = min(end - start, remaining)
+        allocation[i] += size
+        remaining -= size
+
+    return allocation
+
+
+def _upper_hull(points: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # monotone chain over points sorted by x, keeping only right turns
+    hull: List[Tuple[int, int]] = []
+    for x, y in points:
+        while len(hull) >= 2:
+            (x0, y0), (x1, y1) = hull[-2], hull[-1]
+            if (x1 - x0) * (y - y0) - (y1 - y0) * (x - x0) < 0:
+                break
+            hull.pop()
+        hull.append((x, y))
+    return hull
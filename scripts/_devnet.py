@@ -0,0 +1,133 @@
+"""
+Helpers to stand up the lending vault periphery on a local development chain.
+
+Everything deployed here is a mock: the asset is a mintable ERC20 and the
+strategies follow the curves in ``scripts/_allocation.py``, so nothing depends
+on a mainnet fork.
+"""
+from enum import IntFlag
+from typing import List, NamedTuple, Sequence
+
+from ape import project
+
+from scripts._allocation import KinkedCurve, LinearCurve, PiecewiseCurve
+
+MAX_INT = 2**256 - 1
+WEEK = 7 * 86400
+
+
+class ROLES(IntFlag):
+    STRATEGY_MANAGER = 1
+    DEBT_MANAGER = 2
+    EMERGENCY_MANAGER = 4
+    ACCOUNTING_MANAGER = 8
+    KEEPER = 16
+
+
+class Deployment(NamedTuple):
+    asset: object
+    vault: object
+    strategies: List[object]
+    curves: List[object]
+    debt_manager: object
+    accountant: object
+
+
+def deploy_asset(deployer, decimals: int = 6):
+    return deployer.deploy(project.MockToken, "Mock USD", "mUSD", decimals)
+
+
+def deploy_vault(deployer, asset, profit_max_unlock_time: int = WEEK):
+    vault = deployer.deploy(
+        project.dependencies["yearn-vaults"]["master"].VaultV3,
+        asset,
+        "VaultV3",
+        "AV",
+        deployer,
+        profit_max_unlock_time,
+    )
+    vault.set_role(
+        deployer.address,
+        ROLES.STRATEGY_MANAGER | ROLES.DEBT_MANAGER | ROLES.ACCOUNTING_MANAGER,
+        sender=deployer,
+    )
+    vault.set_deposit_limit(MAX_INT, sender=deployer)
+    return vault
+
+
+def deploy_strategy(deployer, vault, curve, name: str = "strat"):
+    if isinstance(curve, LinearCurve):
+        args = (project.MockStrategy, curve.base, curve.slope)
+    elif isinstance(curve, KinkedCurve):
+        args = (
+            project.MockKinkedStrategy,
+            curve.base_rate,
+            curve.slope1,
+            curve.slope2,
+            curve.kink,
+            curve.borrowed,
+            curve.other_supply,
+        )
+    elif isinstance(curve, PiecewiseCurve):
+        args = (
+            project.MockPiecewiseStrategy,
+            [assets for assets, _ in curve.points],
+            [apr for _, apr in curve.points],
+        )
+    else:
+        raise ValueError(f"no mock strategy for {type(curve).__name__}")
+
+    contract_type, *curve_args = args
+    strategy = deployer.deploy(contract_type, vault, name, *curve_args)
+    vault.add_strategy(strategy.address, sender=deployer)
+    vault.update_max_debt_for_strategy(strategy.address, MAX_INT, sender=deployer)
+    return strategy
+
+
+def deploy_debt_manager(deployer, vault, strategies, keeper=None):
+    debt_manager = deployer.deploy(project.LenderDebtManager, vault)
+    if keeper is not None:
+        debt_manager.setRole(keeper.address, ROLES.KEEPER, sender=deployer)
+    vault.set_role(
+        debt_manager.address,
+        ROLES.DEBT_MANAGER | ROLES.ACCOUNTING_MANAGER | ROLES.KEEPER,
+        sender=deployer,
+    )
+
+    for strategy in strategies:
+        debt_manager.addStrategy(strategy, sender=deployer)
+
+    return debt_manager
+
+
+def deploy_accountant(deployer, vault):
+    accountant = deployer.deploy(project.SimpleRefundsAccountant, 1_000, 1_000)
+    vault.set_accountant(accountant.address, sender=deployer)
+    return accountant
+
+
+def deploy_periphery(
+    deployer, curves: Sequence, decimals: int = 6, keeper=None
+) -> Deployment:
+    asset = deploy_asset(deployer, decimals)
+    vault = deploy_vault(deployer, asset)
+    strategies = [
+        deploy_strategy(deployer, vault, curve, f"strat{i}")
+        for i, curve in enumerate(curves)
+    ]
+    debt_manager = deploy_debt_manager(deployer, vault, strategies, keeper)
+    accountant = deploy_accountant(deployer, vault)
+    return Deployment(asset, vault, strategies, list(curves), debt_manager, accountant)
+
+
+def deposit(account, deployment: Deployment, amount: int):
+    deployment.asset.mint(account.address, amount, sender=account)
+    deployment.asset.approve(deployment.vault.address, amount, sender=account)
+    return deployment.vault.deposit(amount, account.address, sender=account)
+
+
+def current_debts(deployment: Deployment) -> List[int]:
+    return [
+        deployment.vault.strategies(strategy.address).current_debt
+        for strategy in deployment.strategies
+    ]
@@ -0,0 +1,204 @@
+"""
+Running fee and refund totals of an accountant, kept in an append-only ledger.
+
+``FeeIndexer`` follows the chain a range of blocks at a time with one
+``eth_getLogs`` per range. It picks up ``StrategyReported`` of the vaults and
+the fee and distribution events of the accountant. Every event becomes one
+JSON line appended to the ledger. Only the per-strategy and per-vault totals
+are kept in memory, so a long history costs disk, not RAM. On restart the
+totals are rebuilt by streaming the ledger once, and indexing resumes after
+the last block recorded in the cursor file next to it.
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import requests
+from eth_utils import keccak
+
+
+def topic(signature: str) -> str:
+    return "0x" + keccak(text=signature).hex()
+
+
+# vault event, its layout has to match the vault version being indexed
+STRATEGY_REPORTED = topic(
+    "StrategyReported(address,uint256,uint256,uint256,uint256,uint256)"
+)
+UPDATE_PERFORMANCE_FEE = topic("UpdatePerformanceFee(address,uint256)")
+UPDATE_MANAGEMENT_FEE = topic("UpdateManagementFee(address,uint256)")
+DISTRIBUTE_REWARDS = topic("DistributeRewards(address,uint256)")
+
+KINDS = {
+    STRATEGY_REPORTED: "report",
+    UPDATE_PERFORMANCE_FEE: "performance_fee",
+    UPDATE_MANAGEMENT_FEE: "management_fee",
+    DISTRIBUTE_REWARDS: "distribute",
+}
+
+
+@dataclass
+class StrategyTotals:
+    reports: int = 0
+    gain: int = 0
+    loss: int = 0
+    fees: int = 0
+    refunds: int = 0
+    # latest fee config, in bps
+    management_fee: int = 0
+    performance_fee: int = 0
+
+
+@dataclass
+class Ledger:
+    """Append-only JSON lines, plus the last block indexed in ``<path>.cursor``."""
+
+    path: Path
+    strategies: Dict[str, StrategyTotals] = field(default_factory=dict)
+    distributed: Dict[str, int] = field(default_factory=dict)
+    cursor: Optional[int] = None
+
+    def __post_init__(self):
+        self.path = Path(self.path)
+        self._cursor_path = self.path.with_name(self.path.name + ".cursor")
+        self._last = (-1, -1)
+        for entry in self.entries():
+            self._apply(entry)
+        if self._cursor_path.is_file():
+            self.cursor = int(self._cursor_path.read_text())
+
+    def entries(self) -> Iterator[dict]:
+        if not self.path.is_file():
+            return
+        with self.path.open() as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def append(self, entries: Sequence[dict], block: int) -> None:
+        # a crash between writing the entries and the cursor replays the range:
+        # anything at or before the last entry already on disk is skipped
+        fresh = [e for e in entries if (e["block"], e["log_index"]) > self._last]
+        if fresh:
+            with self.path.open("a") as f:
+                for entry in fresh:
+                    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            for entry in fresh:
+                self._apply(entry)
+
+        tmp = self._cursor_path.with_name(self._cursor_path.name + ".tmp")
+        tmp.write_text(f"{block}\n")
+        tmp.replace(self._cursor_path)
+        self.cursor = block
+
+    def _apply(self, entry: dict) -> None:
+        self._last = (entry["block"], entry["log_index"])
+        kind = entry["kind"]
+        if kind == "distribute":
+            vault = entry["vault"]
+            self.distributed[vault] = self.distributed.get(vault, 0) + entry["rewards"]
+            return
+
+        totals = self.strategies.setdefault(entry["strategy"], StrategyTotals())
+        if kind == "report":
+            totals.reports += 1
+            totals.gain += entry["gain"]
+            totals.loss += entry["loss"]
+            totals.fees += entry["total_fees"]
+            totals.refunds += entry["total_refunds"]
+        else:
+            setattr(totals, kind, entry["fee"])
+
+    def totals(self) -> dict:
+        return {
+            "block": self.cursor,
+            "strategies": {s: asdict(t) for s, t in self.strategies.items()},
+            "distributed": dict(self.distributed),
+        }
+
+
+@dataclass
+class FeeIndexer:
+    endpoint: str
+    accountant: str
+    vaults: Sequence[str]
+
+    def __post_init__(self):
+        self.session = requests.Session()
+        self.addresses = [self.accountant, *self.vaults]
+
+    def head(self) -> int:
+        return int(self._rpc("eth_blockNumber", []), 16)
+
+    def logs(self, start: int, end: int) -> List[dict]:
+        """Ledger entries of every indexed event in ``[start, end]``, in order."""
+        raw = self._rpc(
+            "eth_getLogs",
+            [
+                {
+                    "fromBlock": hex(start),
+                    "toBlock": hex(end),
+                    "address": self.addresses,
+                    "topics": [list(KINDS)],
+                }
+            ],
+        )
+        entries = [decode_log(log) for log in raw if not log.get("removed")]
+        return sorted(entries, key=lambda e: (e["block"], e["log_index"]))
+
+    def sync(
+        self, ledger: Ledger, start: int, confirmations: int = 0, step: int = 1_000
+    ) -> int:
+        """Index up to ``confirmations`` blocks behind the head, returns the block."""
+        end = self.head() - confirmations
+        block = start if ledger.cursor is None else ledger.cursor + 1
+        while block <= end:
+            last = min(block + step - 1, end)
+            ledger.append(self.logs(block, last), last)
+            block = last + 1
+        return end
+
+    def _rpc(self, method: str, params: list):
+        response = self.session.post(
+            self.endpoint,
+            json={"jsonrpc": "2.0", "id": 0, "method": method, "params": params},
+        )
+        response.raise_for_status()
+        reply = response.json()
+        if "error" in reply:
+            raise RuntimeError(f"{method} {params} failed: {reply['error']}")
+        return reply["result"]
+
+
+def decode_log(log: dict) -> dict:
+    kind = KINDS[log["topics"][0]]
+    indexed = "0x" + log["topics"][1][-40:]
+    data = bytes.fromhex(log["data"][2:])
+    words = [int.from_bytes(data[i : i + 32], "big") for i in range(0, len(data), 32)]
+
+    entry = {
+        "block": int(log["blockNumber"], 16),
+        "log_index": int(log["logIndex"], 16),
+        "tx": log["transactionHash"],
+        "kind": kind,
+    }
+    if kind == "report":
+        gain, loss, current_debt, total_fees, total_refunds = words[:5]
+        entry.update(
+            vault=log["address"].lower(),
+            strategy=indexed,
+            gain=gain,
+            loss=loss,
+            current_debt=current_debt,
+            total_fees=total_fees,
+            total_refunds=total_refunds,
+        )
+    elif kind == "distribute":
+        entry.update(vault=indexed, rewards=words[0])
+    else:
+        entry.update(strategy=indexed, fee=words[0])
+    return entry
@@ -0,0 +1,494 @@
+"""
+Predict what ``updateAllocations`` would do without touching a node.
+
+``simulate`` replays the allocator's decisions on an in-memory snapshot: which
+strategy is drained, where the idle goes, every external call made on the way
+and the resulting change of the vault's yearly yield. ``GasModel`` turns the
+call counts into gas, with per-call costs fitted from profiled transactions
+(see ``scripts/calibrate_gas_model.py``).
+
+The simulation follows the spot APR path, i.e. ``twapWindow == 0``, and
+evaluates each curve at the strategy's debt, as if every strategy had just
+reported.
+"""
+import json
+from collections import Counter
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from scripts._allocation import MAX_BPS, annual_yield
+
+if TYPE_CHECKING:
+    # only the fit needs traces, the simulation runs without ape installed
+    from scripts._gas_profile import Breakdown
+
+MAX_UINT = 2**256 - 1
+APR_CALL = "strategy.aprAfterDebtChange"
+
+
+@dataclass(frozen=True)
+class StrategyState:
+    curve: object
+    debt: int
+    max_debt: int = MAX_UINT
+    # what maxWithdraw lets the vault take out right now
+    liquidity: int = MAX_UINT
+    enabled: bool = True
+    min_allocation_bps: int = 0
+    max_allocation_bps: int = MAX_BPS
+    priority: int = 0
+    needs_tend: bool = False
+    # the strategy holds an unrealised gain or loss
+    needs_report: bool = False
+
+    def apr(self, delta: int = 0) -> int:
+        return self.curve.apr(max(self.debt + delta, 0))
+
+
+@dataclass(frozen=True)
+class AllocatorState:
+    strategies: Tuple[StrategyState, ...]
+    idle: int
+    minimum_idle: int = 0
+    idle_split_count: int = 1
+    idle_chunks: int = 10
+
+    @property
+    def total_assets(self) -> int:
+        return self.idle + sum(strategy.debt for strategy in self.strategies)
+
+
+@dataclass
+class Simulation:
+    state: AllocatorState
+    debts: List[int]
+    idle: int
+    calls: Counter
+    lowest: Optional[int] = None
+    highest: Optional[int] = None
+    gas: int = 0
+
+    @property
+    def yield_before(self) -> int:
+        return sum(
+            annual_yield(strategy.curve, strategy.debt)
+            for strategy in self.state.strategies
+        )
+
+    @property
+    def yield_after(self) -> int:
+        return sum(
+            annual_yield(strategy.curve, debt)
+            for strategy, debt in zip(self.state.strategies, self.debts)
+        )
+
+    @property
+    def yield_change(self) -> int:
+        return self.yield_after - self.yield_before
+
+    @property
+    def external_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+@dataclass
+class GasModel:
+    # base cost and calldata
+    intrinsic: int
+    # debt manager's own execution: fixed part and part growing per strategy
+    base: int
+    per_strategy: int
+    # inclusive gas of each external call, keyed as "<contract>.<method>"
+    calls: Dict[str, int] = field(default_factory=dict)
+
+    def predict(self, calls: Mapping[str, int], strategy_count: int) -> int:
+        return (
+            self.intrinsic
+            + self.base
+            + self.per_strategy * strategy_count
+            + sum(self.calls.get(call, 0) * count for call, count in calls.items())
+        )
+
+    @classmethod
+    def fit(cls, samples: Sequence[Tuple[int, "Breakdown"]]) -> "GasModel":
+        """
+        Fit a model from ``(strategy count, breakdown)`` samples. Frames must be
+        labelled ``vault`` and ``strategy`` so their names match the call keys.
+        """
+        if not samples:
+            raise ValueError("no samples to fit")
+
+        costs: Dict[str, List[int]] = {}
+        points = []
+        for strategy_count, breakdown in samples:
+            for call in breakdown.root.calls:
+                costs.setdefault(call.name, []).append(call.gas)
+            points.append((strategy_count, breakdown.root.self_gas))
+
+        # least squares line of the debt manager's own gas over the strategy count
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        variance = sum((x - mean_x) ** 2 for x, _ in points)
+        slope = (
+            sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+            if variance
+            else 0
+        )
+
+        return cls(
+            intrinsic=round(
+                sum(breakdown.intrinsic_gas for _, breakdown in samples) / len(samples)
+            ),
+            base=round(mean_y - slope * mean_x),
+            per_strategy=round(slope),
+            calls={call: round(sum(gas) / len(gas)) for call, gas in costs.items()},
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "GasModel":
+        return cls(**json.loads(Path(path).read_text()))
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(asdict(self), indent=2, sort_keys=True) + "\n")
+
+
+# rough figures from local hardhat runs, refit with calibrate_gas_model for real numbers
+DEFAULT_GAS_MODEL = GasModel(
+    intrinsic=21_064,
+    base=18_000,
+    per_strategy=7_500,
+    calls={
+        "vault.total_idle": 2_400,
+        "vault.totalAssets": 2_600,
+        "vault.minimum_total_idle": 2_400,
+        "vault.strategies": 5_500,
+        "vault.tend_strategy": 12_000,
+        "vault.process_report": 75_000,
+        "vault.update_debt": 68_000,
+        APR_CALL: 6_000,
+        "strategy.maxWithdraw": 7_000,
+        "strategy.tendTrigger": 800,
+        "strategy.balanceOf": 1_200,
+        "strategy.convertToAssets": 3_000,
+    },
+)
+
+
+def simulate(
+    state: AllocatorState, model: Optional[GasModel] = DEFAULT_GAS_MODEL
+) -> Simulation:
+    """Replay one ``updateAllocations`` on ``state``."""
+    calls: Counter = Counter()
+    simulation = Simulation(
+        state, [strategy.debt for strategy in state.strategies], state.idle, calls
+    )
+    lowest, lowest_apr, highest, potential = _estimate(state, calls)
+
+    if potential > lowest_apr and lowest != highest:
+        strategy = state.strategies[lowest]
+        simulation.lowest = lowest
+
+        calls["strategy.tendTrigger"] += 1
+        if strategy.needs_tend:
+            calls["vault.tend_strategy"] += 1
+
+        calls["vault.strategies"] += 1
+        calls["strategy.balanceOf"] += 1
+        calls["strategy.convertToAssets"] += 1
+        if strategy.needs_report:
+            calls["vault.process_report"] += 1
+
+        calls["vault.strategies"] += 1
+        calls["vault.totalAssets"] += 1
+        released = _releasable(state, lowest, calls)
+        if released:
+            calls["vault.update_debt"] += 1
+            simulation.debts[lowest] -= released
+            simulation.idle += released
+
+        calls[APR_CALL] += 1
+
+    calls["vault.total_idle"] += 1
+    if simulation.idle > 0 and state.strategies:
+        if state.idle_split_count > 1:
+            _distribute_idle(simulation)
+        else:
+            _deposit_idle(simulation, highest)
+
+    if model is not None:
+        simulation.gas = model.predict(calls, len(state.strategies))
+    return simulation
+
+
+def simulate_policy(state: AllocatorState, chunks: int) -> Simulation:
+    """
+    Replay one ``updateAllocations`` with a ``MarginalAprPolicy`` of ``chunks``
+    set. Only the debts are followed, neither calls nor gas.
+    """
+    targets = _marginal_apr_targets(state, chunks)
+    simulation = Simulation(
+        state, [strategy.debt for strategy in state.strategies], state.idle, Counter()
+    )
+    total = state.total_assets
+
+    # releases first, so the idle they free funds the increases
+    for i, strategy in enumerate(state.strategies):
+        debt = simulation.debts[i]
+        keep = max(targets[i], total * strategy.min_allocation_bps // MAX_BPS)
+        if targets[i] >= debt or debt <= keep:
+            continue
+
+        released = min(debt - keep, strategy.liquidity)
+        simulation.debts[i] -= released
+        simulation.idle += released
+
+    available = max(simulation.idle - state.minimum_idle, 0)
+    for i, strategy in enumerate(state.strategies):
+        if not strategy.enabled or available == 0:
+            continue
+
+        target = min(targets[i], strategy.max_debt, _ceiling(state, strategy))
+        if target <= simulation.debts[i]:
+            continue
+
+        amount = min(target - simulation.debts[i], available)
+        available -= amount
+        _vault_deposit(simulation, i, simulation.debts[i] + amount)
+
+    return simulation
+
+
+def _marginal_apr_targets(state: AllocatorState, chunks: int) -> List[int]:
+    # mirror of MarginalAprPolicy.targetDebts: floors first, then chunk by chunk
+    total = state.total_assets
+    to_deploy = max(total - state.minimum_idle, 0)
+    targets, room = [], []
+    for strategy in state.strategies:
+        if not strategy.enabled:
+            targets.append(strategy.debt)
+            room.append(0)
+        else:
+            ceiling = min(strategy.max_debt, _ceiling(state, strategy))
+            targets.append(min(total * strategy.min_allocation_bps // MAX_BPS, ceiling))
+            room.append(ceiling - targets[-1])
+        to_deploy -= min(to_deploy, targets[-1])
+
+    chunk = to_deploy // chunks or to_deploy
+    sizes = [min(chunk, to_deploy, r) for r in room]
+    aprs = [
+        strategy.curve.apr(target + size)
+        for strategy, target, size in zip(state.strategies, targets, sizes)
+    ]
+    while to_deploy > 0:
+        candidates = [j for j, size in enumerate(sizes) if size > 0]
+        if not candidates:
+            break
+
+        # the first one wins ties, as in the contract
+        best = max(candidates, key=lambda j: (aprs[j], -j))
+        size = min(sizes[best], to_deploy)
+        targets[best] += size
+        room[best] -= size
+        to_deploy -= size
+
+        sizes[best] = min(chunk, to_deploy, room[best])
+        aprs[best] = state.strategies[best].curve.apr(targets[best] + sizes[best])
+
+    return targets
+
+
+def rank(
+    states: Iterable[AllocatorState],
+    model: GasModel = DEFAULT_GAS_MODEL,
+    gas_price: float = 0,
+) -> List[Simulation]:
+    """
+    Simulate every candidate, best first: the highest yearly yield change net
+    of the gas it costs, ``gas_price`` being the price of one gas in asset units.
+    """
+    simulations = [simulate(state, model) for state in states]
+    return sorted(
+        simulations,
+        key=lambda simulation: simulation.yield_change - simulation.gas * gas_price,
+        reverse=True,
+    )
+
+
+def with_debts(
+    state: AllocatorState, debts: Sequence[int], idle: int
+) -> AllocatorState:
+    """Copy of ``state`` with other debts, to chain simulations."""
+    strategies = tuple(
+        replace(strategy, debt=debt, needs_report=False)
+        for strategy, debt in zip(state.strategies, debts)
+    )
+    return replace(state, strategies=strategies, idle=idle)
+
+
+def _estimate(state: AllocatorState, calls: Counter) -> Tuple[int, int, int, int]:
+    strategies = state.strategies
+    if not strategies:
+        return 0, MAX_UINT, 0, 0
+
+    if len(strategies) == 1:
+        if not strategies[0].enabled:
+            return 0, MAX_UINT, 0, 0
+
+        calls[APR_CALL] += 1
+        apr = strategies[0].apr()
+        return 0, apr, 0, apr
+
+    calls["vault.total_idle"] += 1
+    calls["vault.totalAssets"] += 1
+
+    lowest, lowest_apr, lowest_nav = 0, MAX_UINT, 0
+    for i, strategy in enumerate(strategies):
+        if not strategy.enabled:
+            continue
+
+        calls["vault.strategies"] += 1
+        if strategy.debt == 0:
+            continue
+
+        calls[APR_CALL] += 1
+        apr = strategy.apr()
+        if apr < lowest_apr or (
+            apr == lowest_apr and strategy.priority < strategies[lowest].priority
+        ):
+            releasable = _releasable(state, i, calls)
+            if releasable == 0:
+                continue
+
+            lowest, lowest_apr, lowest_nav = i, apr, releasable
+
+    highest, potential = 0, 0
+    for i, strategy in enumerate(strategies):
+        if not strategy.enabled:
+            continue
+
+        room = _ceiling(state, strategy)
+        if strategy.debt >= room:
+            continue
+
+        delta = state.idle if i == lowest else lowest_nav + state.idle
+        calls[APR_CALL] += 1
+        apr = strategy.apr(min(delta, room - strategy.debt))
+        if apr > potential or (
+            apr == potential and strategy.priority > strategies[highest].priority
+        ):
+            highest, potential = i, apr
+
+    return lowest, lowest_apr, highest, potential
+
+
+def _deposit_idle(simulation: Simulation, highest: int) -> None:
+    state = simulation.state
+    strategy = state.strategies[highest]
+    if not strategy.enabled:
+        return
+
+    calls = simulation.calls
+    calls["vault.strategies"] += 1
+    calls["vault.totalAssets"] += 1
+
+    current = simulation.debts[highest]
+    target = min(simulation.idle + current, _ceiling(state, strategy))
+    if target <= current:
+        return
+
+    calls["vault.update_debt"] += 1
+    calls[APR_CALL] += 1
+    simulation.highest = highest
+    _vault_deposit(simulation, highest, target)
+
+
+def _distribute_idle(simulation: Simulation) -> None:
+    state = simulation.state
+    calls = simulation.calls
+    calls["vault.minimum_total_idle"] += 1
+    if simulation.idle <= state.minimum_idle:
+        return
+    amount = simulation.idle - state.minimum_idle
+
+    # enabled strategies by current APR, earlier ones first on ties
+    calls[APR_CALL] += sum(strategy.enabled for strategy in state.strategies)
+    targets = sorted(
+        (i for i, strategy in enumerate(state.strategies) if strategy.enabled),
+        key=lambda i: -state.strategies[i].curve.apr(simulation.debts[i]),
+    )[: state.idle_split_count]
+
+    calls["vault.totalAssets"] += 1
+    calls["vault.strategies"] += len(targets)
+    room = [
+        max(
+            min(state.strategies[i].max_debt, _ceiling(state, state.strategies[i]))
+            - simulation.debts[i],
+            0,
+        )
+        for i in targets
+    ]
+
+    chunk = amount // state.idle_chunks or amount
+    amounts = [0] * len(targets)
+    remaining = amount
+    while remaining > 0:
+        best, best_apr, best_size = None, 0, 0
+        for j, i in enumerate(targets):
+            size = min(chunk, remaining, room[j])
+            if size == 0:
+                continue
+
+            calls[APR_CALL] += 1
+            apr = state.strategies[i].curve.apr(simulation.debts[i] + amounts[j] + size)
+            if best is None or apr > best_apr:
+                best, best_apr, best_size = j, apr, size
+
+        if best is None:
+            break
+
+        amounts[best] += best_size
+        room[best] -= best_size
+        remaining -= best_size
+
+    for j, i in enumerate(targets):
+        if amounts[j] == 0:
+            continue
+
+        calls["vault.strategies"] += 1
+        calls["vault.update_debt"] += 1
+        calls[APR_CALL] += 1
+        _vault_deposit(simulation, i, simulation.debts[i] + amounts[j])
+
+
+def _vault_deposit(simulation: Simulation, i: int, target: int) -> None:
+    # the vault caps the new debt at max_debt and never dips into minimum idle
+    state = simulation.state
+    target = min(target, state.strategies[i].max_debt)
+    available = max(simulation.idle - state.minimum_idle, 0)
+    added = min(max(target - simulation.debts[i], 0), available)
+    simulation.debts[i] += added
+    simulation.idle -= added
+
+
+def _releasable(state: AllocatorState, i: int, calls: Counter) -> int:
+    strategy = state.strategies[i]
+    floor = state.total_assets * strategy.min_allocation_bps // MAX_BPS
+    if strategy.debt <= floor:
+        return 0
+
+    calls["strategy.maxWithdraw"] += 1
+    return min(strategy.debt - floor, strategy.liquidity, strategy.debt)
+
+
+def _ceiling(state: AllocatorState, strategy: StrategyState) -> int:
+    return state.total_assets * strategy.max_allocation_bps // MAX_BPS
@@ -0,0 +1,140 @@
+"""
+Attribute the gas of a transaction to the contracts and methods it went through.
+
+The call tree comes from the provider's tracer (``receipt.call_tree``). Every
+frame is labelled with the name registered for its address and the method
+whose selector it was called with. Each frame gets its inclusive gas and its
+own gas (what is left once its sub-calls are taken out).
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set
+
+from eth_utils import keccak
+from hexbytes import HexBytes
+
+from scripts._metrics import format_table
+
+
+@dataclass
+class Frame:
+    contract: str
+    method: str
+    gas: int
+    depth: int
+    calls: List["Frame"] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return f"{self.contract}.{self.method}"
+
+    @property
+    def self_gas(self) -> int:
+        return max(self.gas - sum(call.gas for call in self.calls), 0)
+
+    def walk(self) -> Iterator["Frame"]:
+        yield self
+        for call in self.calls:
+            yield from call.walk()
+
+
+@dataclass
+class Breakdown:
+    label: str
+    gas_used: int
+    root: Frame
+
+    @property
+    def intrinsic_gas(self) -> int:
+        # base cost and calldata, paid before the first frame runs
+        return max(self.gas_used - self.root.gas, 0)
+
+
+class GasProfiler:
+    def __init__(self):
+        self.labels: Dict[str, str] = {}
+        self.methods: Dict[bytes, str] = {}
+        self.entrypoints: Dict[str, Set[bytes]] = defaultdict(set)
+
+    def register(self, contract, label: Optional[str] = None) -> None:
+        """Name the frames executed by ``contract`` and decode its selectors."""
+        self.labels[_key(contract.address)] = label or contract.contract_type.name
+        for abi in contract.contract_type.abi:
+            if abi.type == "function":
+                self.methods[keccak(text=abi.selector)[:4]] = abi.name
+
+    def watch(self, contract, method: str) -> None:
+        """Mark calls to ``contract.method`` as transactions worth profiling."""
+        self.register(contract)
+        for selector, name in self.methods.items():
+            if name == method:
+                self.entrypoints[_key(contract.address)].add(selector)
+
+    def is_watched(self, receiver, data) -> bool:
+        selectors = self.entrypoints.get(_key(receiver), ())
+        return bytes(HexBytes(data)[:4]) in selectors
+
+    def breakdown(self, receipt, label: Optional[str] = None) -> Breakdown:
+        root = self._frame(receipt.call_tree, 0)
+        return Breakdown(label or receipt.txn_hash, receipt.gas_used, root)
+
+    def _frame(self, node, depth: int) -> Frame:
+        calldata = bytes(HexBytes(node.calldata or b""))
+        method = self.methods.get(calldata[:4], calldata[:4].hex() or "fallback")
+        address = _key(node.address)
+        return Frame(
+            contract=self.labels.get(address, address),
+            method=method,
+            gas=node.gas_cost or 0,
+            depth=depth,
+            calls=[self._frame(call, depth + 1) for call in node.calls],
+        )
+
+
+def gas_by_contract(breakdown: Breakdown) -> Dict[str, int]:
+    totals: Dict[str, int] = defaultdict(int)
+    for frame in breakdown.root.walk():
+        totals[frame.contract] += frame.self_gas
+
+    totals["intrinsic"] = breakdown.intrinsic_gas
+    return dict(totals)
+
+
+def render_breakdown(breakdown: Breakdown) -> str:
+    def share(gas: int) -> str:
+        return f"{gas / breakdown.gas_used:.1%}" if breakdown.gas_used else "-"
+
+    rows = [
+        ["  " * frame.depth + frame.name, frame.gas, frame.self_gas, share(frame.gas)]
+        for frame in breakdown.root.walk()
+    ]
+    calls = format_table(["call", "gas", "self", "share"], rows)
+
+    totals = sorted(gas_by_contract(breakdown).items(), key=lambda item: -item[1])
+    contracts = format_table(
+        ["contract", "gas", "share"],
+        [[contract, gas, share(gas)] for contract, gas in totals],
+    )
+
+    return f"{breakdown.label}: {breakdown.gas_used:,} gas\n\n{calls}\n\n{contracts}"
+
+
+def folded_stacks(breakdown: Breakdown) -> List[str]:
+    """Self gas per stack in the folded format read by flamegraph.pl and speedscope."""
+    lines = []
+
+    def fold(frame: Frame, stack: List[str]) -> None:
+        stack = stack + [frame.name]
+        if frame.self_gas:
+            lines.append(f"{';'.join(stack)} {frame.self_gas}")
+        for call in frame.calls:
+            fold(call, stack)
+
+    fold(breakdown.root, [])
+    return lines
+
+
+def _key(address) -> str:
+    if isinstance(address, (bytes, bytearray)):
+        return "0x" + bytes(address).hex()
+    return str(address).lower()
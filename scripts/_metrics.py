@@ -0,0 +1,79 @@
+"""
+Small helpers to aggregate gas usage and print it as plain-text tables.
+"""
+import math
+from collections import defaultdict
+from typing import Dict, List, Sequence
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values: Sequence[int], pct: float) -> int:
+    """Nearest-rank percentile, ``0`` for an empty sample."""
+    if not values:
+        return 0
+
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class GasRecorder:
+    """Collects ``gas_used`` per operation label."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[int]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+
+    def record(self, label: str, receipt) -> None:
+        self.samples[label].append(receipt.gas_used)
+
+    def record_failure(self, label: str) -> None:
+        self.failures[label] += 1
+
+    @property
+    def transactions(self) -> int:
+        return sum(len(values) for values in self.samples.values())
+
+    def rows(self) -> List[list]:
+        rows = []
+        for label in sorted(set(self.samples) | set(self.failures)):
+            values = self.samples[label]
+            rows.append(
+                [label, len(values), self.failures[label]]
+                + [percentile(values, pct) for pct in PERCENTILES]
+                + [max(values, default=0)]
+            )
+
+        return rows
+
+    def table(self) -> str:
+        headers = ["operation", "txs", "failed"]
+        headers += [f"p{pct}" for pct in PERCENTILES] + ["max"]
+        return format_table(headers, self.rows())
+
+
+def format_table(headers: Sequence[str], rows: Sequence[Sequence]) -> str:
+    cells = [[str(h) for h in headers]] + [[_fmt(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+
+    lines = []
+    for n, row in enumerate(cells):
+        lines.append(
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            )
+        )
+        if n == 0:
+            lines.append("  ".join("-" * width for width in widths))
+
+    return "\n".join(lines)
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}"
+    return str(value)
@@ -0,0 +1,252 @@
+"""
+Scenario corpus for judging allocator changes by yield as well as gas.
+
+A scenario is a JSON file under ``scenarios/v<version>/``. It lists the
+strategies (curve, starting debt and optional ``max_debt``), the idle the vault
+starts with, and a flow of ``deposit``, ``withdraw`` and ``allocate`` steps.
+Amounts are in the asset's smallest unit, and ``min_quality`` is the least
+share of the optimum any policy has to reach on it. ``scripts/run_scenarios.py``
+plays every scenario on a local chain, or on the Python mirrors of the
+allocator, and scores the blended APR it ends with against
+``optimal_allocation``. The scores are then checked against a baseline recorded
+next to the corpus.
+"""
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from scripts._allocation import (
+    KinkedCurve,
+    LinearCurve,
+    PiecewiseCurve,
+    blended_apr,
+    optimal_allocation,
+)
+from scripts._gas_model import (
+    AllocatorState,
+    StrategyState,
+    simulate,
+    simulate_policy,
+    with_debts,
+)
+
+CORPUS_VERSION = 1
+BASELINE = "baseline.json"
+ACTIONS = ("deposit", "withdraw", "allocate")
+# how far an allocation may beat the sampled optimum before the solver is at fault
+OPTIMUM_SLACK = 1e-3
+
+
+@dataclass(frozen=True)
+class StrategySpec:
+    curve: object
+    debt: int
+    max_debt: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Step:
+    action: str
+    amount: int = 0
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    description: str
+    decimals: int
+    idle: int
+    strategies: Tuple[StrategySpec, ...]
+    flows: Tuple[Step, ...]
+    minimum_idle: int = 0
+    # (idleSplitCount, idleChunks) of the debt manager
+    idle_split: Tuple[int, int] = (1, 10)
+    min_quality: float = 0.0
+
+    @property
+    def curves(self) -> List[object]:
+        return [s.curve for s in self.strategies]
+
+    @classmethod
+    def load(cls, path: Path) -> "Scenario":
+        raw = json.loads(Path(path).read_text())
+        version = raw.pop("version")
+        if version != CORPUS_VERSION:
+            raise ValueError(
+                f"{path}: corpus version {version}, expected {CORPUS_VERSION}"
+            )
+
+        strategies = tuple(
+            StrategySpec(parse_curve(s["curve"]), s["debt"], s.get("max_debt"))
+            for s in raw.pop("strategies")
+        )
+        flows = tuple(Step(**step) for step in raw.pop("flows"))
+        for step in flows:
+            if step.action not in ACTIONS:
+                raise ValueError(f"{path}: unknown action {step.action!r}")
+
+        idle_split = tuple(raw.pop("idle_split", (1, 10)))
+        return cls(**raw, strategies=strategies, flows=flows, idle_split=idle_split)
+
+
+def parse_curve(raw: dict):
+    kind, params = raw["type"], {k: v for k, v in raw.items() if k != "type"}
+    if kind == "linear":
+        return LinearCurve(**params)
+    if kind == "kinked":
+        return KinkedCurve(**params)
+    if kind == "piecewise":
+        return PiecewiseCurve(tuple(map(tuple, params["points"])))
+    raise ValueError(f"unknown curve type {kind!r}")
+
+
+def load_corpus(directory: Path) -> List[Scenario]:
+    return [
+        Scenario.load(path)
+        for path in sorted(Path(directory).glob("*.json"))
+        if path.name != BASELINE
+    ]
+
+
+@dataclass(frozen=True)
+class Score:
+    # blended APR reached over the optimum, 1 is as good as it gets
+    quality: float
+    # gas of every updateAllocations of the flow, None when not measured
+    gas: Optional[int]
+    achieved_apr: int
+    optimal_apr: int
+
+
+def score(
+    scenario: Scenario, debts: Sequence[int], idle: int, gas: Optional[int]
+) -> Score:
+    caps = [
+        s.max_debt if s.max_debt is not None else sum(debts) + idle
+        for s in scenario.strategies
+    ]
+    deployable = max(sum(debts) + idle - scenario.minimum_idle, 0)
+    optimum = optimal_allocation(scenario.curves, deployable, caps=caps)
+
+    achieved = blended_apr(scenario.curves, debts, idle)
+    optimal = blended_apr(scenario.curves, optimum, idle + sum(debts) - sum(optimum))
+    quality = achieved / optimal if optimal else 1.0
+    # past 1 a better allocator would look like a regression, and a worse one
+    # could still score above the baseline
+    if quality > 1 + OPTIMUM_SLACK:
+        raise ValueError(
+            f"{scenario.name}: allocation beats the optimum by {quality - 1:.4%}, "
+            "optimal_allocation is off for these curves"
+        )
+    return Score(
+        quality=min(quality, 1.0),
+        gas=gas,
+        achieved_apr=achieved,
+        optimal_apr=optimal,
+    )
+
+
+def play_model(scenario: Scenario, policy_chunks: Optional[int] = None) -> Score:
+    """
+    Play ``scenario`` on the Python mirrors of the allocator instead of a chain,
+    with the built-in policy or a ``MarginalAprPolicy`` of ``policy_chunks``.
+    The gas isn't measured.
+    """
+    state = AllocatorState(
+        strategies=tuple(
+            StrategyState(s.curve, s.debt)
+            if s.max_debt is None
+            else StrategyState(s.curve, s.debt, s.max_debt)
+            for s in scenario.strategies
+        ),
+        idle=scenario.idle,
+        minimum_idle=scenario.minimum_idle,
+        idle_split_count=scenario.idle_split[0],
+        idle_chunks=scenario.idle_split[1],
+    )
+    debts, idle = [s.debt for s in scenario.strategies], scenario.idle
+    for step in scenario.flows:
+        if step.action == "deposit":
+            idle += step.amount
+        elif step.action == "withdraw":
+            # the vault pays from idle first, then from the strategies in order
+            needed = step.amount - min(step.amount, idle)
+            idle -= step.amount - needed
+            for i, debt in enumerate(debts):
+                taken = min(debt, needed)
+                debts[i] -= taken
+                needed -= taken
+        else:
+            state = with_debts(state, debts, idle)
+            if policy_chunks is None:
+                simulation = simulate(state, model=None)
+            else:
+                simulation = simulate_policy(state, policy_chunks)
+            debts, idle = simulation.debts, simulation.idle
+
+    return score(scenario, debts, idle, None)
+
+
+def load_baseline(path: Path) -> Dict[str, Dict[str, dict]]:
+    """Scores by policy, then by scenario name."""
+    path = Path(path)
+    return json.loads(path.read_text()) if path.is_file() else {}
+
+
+def save_baseline(
+    path: Path, baseline: Dict[str, Dict[str, dict]], policy: str, scores: dict
+) -> None:
+    # a model run has no gas to record, keep what a chain run measured
+    previous = baseline.get(policy, {})
+    baseline[policy] = {
+        name: {
+            "quality": round(s.quality, 6),
+            "gas": s.gas if s.gas is not None else previous.get(name, {}).get("gas"),
+        }
+        for name, s in sorted(scores.items())
+    }
+    Path(path).write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+def regressions(
+    baseline: Dict[str, dict],
+    scores: Dict[str, Score],
+    quality_tolerance: float,
+    gas_tolerance: float,
+    floors: Optional[Dict[str, float]] = None,
+) -> List[str]:
+    """
+    What falls under its floor or got worse than ``baseline`` beyond the
+    tolerances, empty if nothing. A scenario without a baseline fails too, gas
+    is only compared once a chain run recorded it.
+    """
+    floors = floors or {}
+    failures = []
+    for name, current in scores.items():
+        floor = floors.get(name, 0.0)
+        if current.quality < floor:
+            failures.append(
+                f"{name}: quality {current.quality:.6f} < floor {floor:.6f}"
+            )
+
+        if name not in baseline:
+            failures.append(f"{name}: no baseline recorded")
+            continue
+
+        recorded = baseline[name]
+        if current.quality < recorded["quality"] - quality_tolerance:
+            failures.append(
+                f"{name}: quality {current.quality:.6f} "
+                f"< baseline {recorded['quality']:.6f}"
+            )
+        if (
+            current.gas is not None
+            and recorded["gas"] is not None
+            and current.gas > recorded["gas"] * (1 + gas_tolerance)
+        ):
+            failures.append(
+                f"{name}: gas {current.gas} > baseline {recorded['gas']} "
+                f"+{gas_tolerance:.0%}"
+            )
+    return failures
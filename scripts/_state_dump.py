@@ -0,0 +1,205 @@
+"""
+Everything an allocation decision depends on, in one small file.
+
+``dump_state`` reads it from any node (a mainnet fork included) through the
+batched reader: vault params and idle, the debt manager settings, each
+strategy's assets, liquidity, config and APR observations, and its APR curve
+sampled from empty up to the whole vault. The file
+is plain JSON, gzipped when its name ends in ``.gz``, and
+``scripts/replay_state.py`` seeds mock contracts with it on a local chain.
+"""
+import gzip
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+from scripts._allocation import PiecewiseCurve
+from scripts._gas_model import AllocatorState, StrategyState
+from scripts._state_reader import (
+    StateReader,
+    decode_words,
+    encode_address,
+    encode_int256,
+    selector,
+)
+
+DECIMALS = selector("decimals()")
+STRATEGY_TOTAL_ASSETS = selector("totalAssets()")
+MAX_WITHDRAW = selector("maxWithdraw(address)")
+STRATEGY_CONFIGS = selector("strategyConfigs(address)")
+IDLE_SPLIT_COUNT = selector("idleSplitCount()")
+IDLE_CHUNKS = selector("idleChunks()")
+TWAP_WINDOW = selector("twapWindow()")
+ALLOCATION_POLICY = selector("allocationPolicy()")
+GET_OBSERVATIONS = selector("getObservations(address)")
+APR_AFTER_DEBT_CHANGE = selector("aprAfterDebtChange(int256)")
+
+ZERO_ADDRESS = "0x" + "00" * 20
+
+
+@dataclass(frozen=True)
+class StrategyDump:
+    address: str
+    current_debt: int
+    max_debt: int
+    total_assets: int
+    max_withdraw: int
+    enabled: bool
+    min_allocation_bps: int
+    max_allocation_bps: int
+    priority: int
+    # (assets, apr) samples, sorted by assets
+    curve: Tuple[Tuple[int, int], ...]
+    exiting: bool = False
+    last_apr: int = 0
+    # (timestamp, apr, aprCumulative) of the TWAP ring, oldest first
+    observations: Tuple[Tuple[int, int, int], ...] = ()
+
+
+@dataclass(frozen=True)
+class StateDump:
+    block: int
+    debt_manager: str
+    vault: str
+    decimals: int
+    total_idle: int
+    minimum_total_idle: int
+    idle_split_count: int
+    idle_chunks: int
+    strategies: Tuple[StrategyDump, ...]
+    twap_window: int = 0
+    allocation_policy: str = ZERO_ADDRESS
+
+    def save(self, path: Path) -> None:
+        data = json.dumps(asdict(self), separators=(",", ":")).encode()
+        path = Path(path)
+        path.write_bytes(gzip.compress(data) if path.suffix == ".gz" else data)
+
+    @classmethod
+    def load(cls, path: Path) -> "StateDump":
+        path = Path(path)
+        data = path.read_bytes()
+        raw = json.loads(gzip.decompress(data) if path.suffix == ".gz" else data)
+        strategies = tuple(
+            StrategyDump(
+                **{
+                    **s,
+                    "curve": tuple(map(tuple, s["curve"])),
+                    "observations": tuple(map(tuple, s.get("observations", ()))),
+                }
+            )
+            for s in raw.pop("strategies")
+        )
+        return cls(**raw, strategies=strategies)
+
+    def allocator_state(self) -> AllocatorState:
+        """The dumped state for ``scripts._gas_model.simulate``."""
+        return AllocatorState(
+            strategies=tuple(
+                StrategyState(
+                    PiecewiseCurve(s.curve),
+                    s.current_debt,
+                    s.max_debt,
+                    liquidity=s.max_withdraw,
+                    enabled=s.enabled,
+                    min_allocation_bps=s.min_allocation_bps,
+                    max_allocation_bps=s.max_allocation_bps,
+                    priority=s.priority,
+                    needs_report=s.total_assets != s.current_debt,
+                )
+                for s in self.strategies
+            ),
+            idle=self.total_idle,
+            minimum_idle=self.minimum_total_idle,
+            idle_split_count=self.idle_split_count,
+            idle_chunks=self.idle_chunks,
+        )
+
+
+def dump_state(
+    reader: StateReader, block: Optional[int] = None, samples: int = 16
+) -> StateDump:
+    snapshot = reader.read(block)
+    block = snapshot.block
+    vault, debt_manager = reader.vault, reader.debt_manager
+
+    calls = [
+        (vault, DECIMALS),
+        (debt_manager, IDLE_SPLIT_COUNT),
+        (debt_manager, IDLE_CHUNKS),
+        (debt_manager, TWAP_WINDOW),
+        (debt_manager, ALLOCATION_POLICY),
+    ]
+    for strategy in snapshot.strategies:
+        calls.append((strategy, STRATEGY_TOTAL_ASSETS))
+        calls.append((strategy, MAX_WITHDRAW + encode_address(vault)))
+        calls.append((debt_manager, STRATEGY_CONFIGS + encode_address(strategy)))
+        calls.append((debt_manager, GET_OBSERVATIONS + encode_address(strategy)))
+    results = reader.call(calls, block)
+    (decimals,), (split_count,), (chunks,), (twap_window,), (policy,) = (
+        decode_words(data, 1) for data in results[:5]
+    )
+    per_strategy = [
+        results[5 + 4 * i : 9 + 4 * i] for i in range(len(snapshot.strategies))
+    ]
+    currents = [decode_words(assets, 1)[0] for assets, *_ in per_strategy]
+
+    # sample every curve from empty to holding the whole vault, plus where it is now
+    grid = {snapshot.total_assets * j // max(samples - 1, 1) for j in range(samples)}
+    points = [sorted(grid | {current}) for current in currents]
+
+    calls = [
+        (strategy, APR_AFTER_DEBT_CHANGE + encode_int256(point - current))
+        for strategy, current, strategy_points in zip(
+            snapshot.strategies, currents, points
+        )
+        for point in strategy_points
+    ]
+    aprs = iter(decode_words(data, 1)[0] for data in reader.call(calls, block))
+
+    strategies = []
+    for i, strategy in enumerate(snapshot.strategies):
+        _, max_withdraw, config, observations = per_strategy[i]
+        # StrategyConfig field order: enabled, exiting, min bps, max bps, priority,
+        # lastApr, then the observation ring cursor
+        enabled, exiting, min_bps, max_bps, priority, last_apr = decode_words(config, 6)
+        strategies.append(
+            StrategyDump(
+                address=strategy,
+                current_debt=snapshot.current_debt[i],
+                max_debt=snapshot.max_debt[i],
+                total_assets=currents[i],
+                max_withdraw=decode_words(max_withdraw, 1)[0],
+                enabled=bool(enabled),
+                min_allocation_bps=min_bps,
+                max_allocation_bps=max_bps,
+                priority=priority,
+                curve=tuple((point, next(aprs)) for point in points[i]),
+                exiting=bool(exiting),
+                last_apr=last_apr,
+                observations=_decode_observations(observations),
+            )
+        )
+
+    return StateDump(
+        block=block,
+        debt_manager=debt_manager,
+        vault=vault,
+        decimals=decimals,
+        total_idle=snapshot.total_idle,
+        minimum_total_idle=snapshot.minimum_total_idle,
+        idle_split_count=split_count,
+        idle_chunks=chunks,
+        strategies=tuple(strategies),
+        twap_window=twap_window,
+        allocation_policy=f"0x{policy:040x}",
+    )
+
+
+def _decode_observations(data: bytes) -> Tuple[Tuple[int, int, int], ...]:
+    # dynamic Observation[]: offset to the array, then its length and 3 words each
+    (offset,) = decode_words(data, 1)
+    (length,) = decode_words(data[offset:], 1)
+    words = decode_words(data[offset + 32 :], 3 * length)
+    return tuple(tuple(words[3 * i : 3 * (i + 1)]) for i in range(length))
@@ -0,0 +1,178 @@
+"""
+Read the allocation state of a debt manager with two batched JSON-RPC round trips.
+
+Going through ape contract objects costs an ABI lookup, argument conversion
+and an HTTP request for every view. ``StateReader`` encodes the calldata by
+hand once, sends the ``eth_call`` of a snapshot in batches all pinned to one
+block, and slices the raw return data itself. Without a block, the head is
+fetched first, in one more round trip.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import requests
+from eth_utils import keccak
+
+from scripts._gas_model import AllocatorState, StrategyState
+
+
+def selector(signature: str) -> bytes:
+    return keccak(text=signature)[:4]
+
+
+GET_STRATEGIES = selector("getStrategies()")
+TOTAL_IDLE = selector("total_idle()")
+TOTAL_ASSETS = selector("totalAssets()")
+MINIMUM_TOTAL_IDLE = selector("minimum_total_idle()")
+STRATEGY_PARAMS = selector("strategies(address)")
+# aprAfterDebtChange(0): the argument never changes, so neither does the calldata
+SPOT_APR = selector("aprAfterDebtChange(int256)") + bytes(32)
+
+
+class Snapshot(NamedTuple):
+    """Columns indexed like ``strategies``, read at ``block``."""
+
+    block: int
+    total_idle: int
+    total_assets: int
+    minimum_total_idle: int
+    strategies: Tuple[str, ...]
+    activation: Tuple[int, ...]
+    last_report: Tuple[int, ...]
+    current_debt: Tuple[int, ...]
+    max_debt: Tuple[int, ...]
+    apr: Tuple[int, ...]
+
+    def allocator_state(self, curves: Sequence, **kwargs) -> AllocatorState:
+        """Input for ``scripts._gas_model.simulate``, given each strategy's curve."""
+        return AllocatorState(
+            strategies=tuple(
+                StrategyState(curve, debt, max_debt)
+                for curve, debt, max_debt in zip(
+                    curves, self.current_debt, self.max_debt
+                )
+            ),
+            idle=self.total_idle,
+            minimum_idle=self.minimum_total_idle,
+            **kwargs,
+        )
+
+
+@dataclass
+class StateReader:
+    endpoint: str
+    debt_manager: str
+    vault: str
+
+    def __post_init__(self):
+        self.session = requests.Session()
+        self._calls = {
+            "getStrategies": (self.debt_manager, GET_STRATEGIES),
+            "total_idle": (self.vault, TOTAL_IDLE),
+            "totalAssets": (self.vault, TOTAL_ASSETS),
+            "minimum_total_idle": (self.vault, MINIMUM_TOTAL_IDLE),
+        }
+
+    @classmethod
+    def from_provider(cls, provider, debt_manager, vault) -> "StateReader":
+        return cls(
+            provider.web3.provider.endpoint_uri,
+            str(debt_manager.address),
+            str(vault.address),
+        )
+
+    def read(self, block: Optional[int] = None) -> Snapshot:
+        # pin to the head first: calls at "latest" batched next to
+        # eth_blockNumber may run against another block than the one it returns
+        if block is None:
+            block = int(self._batch([("eth_blockNumber", [])])[0], 16)
+
+        # first trip: the strategy list and the vault totals
+        results = self.call(list(self._calls.values()), block)
+
+        strategies_data, idle, assets, minimum_idle = results
+        strategies = _decode_addresses(strategies_data)
+
+        # second trip: debt and spot APR of every strategy, at the same block
+        calls = []
+        for strategy in strategies:
+            calls.append((self.vault, STRATEGY_PARAMS + encode_address(strategy)))
+            calls.append((strategy, SPOT_APR))
+        results = self.call(calls, block)
+
+        params = [decode_words(data, 4) for data in results[0::2]]
+        return Snapshot(
+            block=block,
+            total_idle=decode_words(idle, 1)[0],
+            total_assets=decode_words(assets, 1)[0],
+            minimum_total_idle=decode_words(minimum_idle, 1)[0],
+            strategies=strategies,
+            activation=tuple(p[0] for p in params),
+            last_report=tuple(p[1] for p in params),
+            current_debt=tuple(p[2] for p in params),
+            max_debt=tuple(p[3] for p in params),
+            apr=tuple(decode_words(data, 1)[0] for data in results[1::2]),
+        )
+
+    def call(self, calls: Sequence[Tuple[str, bytes]], block: int) -> List[bytes]:
+        """Return data of every ``(to, calldata)`` at ``block``, in one batch."""
+        if not calls:
+            return []
+
+        tag = hex(block)
+        results = self._batch(
+            [("eth_call", [{"to": to, "data": _hex(data)}, tag]) for to, data in calls]
+        )
+        return [_bytes(result) for result in results]
+
+    def _batch(self, calls: List[Tuple[str, list]]) -> list:
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(calls)
+        ]
+        response = self.session.post(self.endpoint, json=payload)
+        response.raise_for_status()
+
+        # servers may answer a batch in any order
+        replies: Dict[int, dict] = {reply["id"]: reply for reply in response.json()}
+        results = []
+        for i, (method, params) in enumerate(calls):
+            reply = replies[i]
+            if "error" in reply:
+                raise RuntimeError(f"{method} {params} failed: {reply['error']}")
+            results.append(reply["result"])
+
+        return results
+
+
+def encode_address(address: str) -> bytes:
+    return bytes(12) + bytes.fromhex(str(address)[2:])
+
+
+def encode_int256(value: int) -> bytes:
+    return value.to_bytes(32, "big", signed=True)
+
+
+def _hex(data: bytes) -> str:
+    return "0x" + data.hex()
+
+
+def _bytes(result: str) -> bytes:
+    return bytes.fromhex(result[2:])
+
+
+def decode_words(data: bytes, count: int) -> Tuple[int, ...]:
+    return tuple(
+        int.from_bytes(data[32 * i : 32 * (i + 1)], "big") for i in range(count)
+    )
+
+
+def _decode_addresses(data: bytes) -> Tuple[str, ...]:
+    # dynamic address[]: offset to the array, then its length and the items
+    (offset,) = decode_words(data, 1)
+    length = int.from_bytes(data[offset : offset + 32], "big")
+    start = offset + 32
+    return tuple(
+        "0x" + data[start + 32 * i + 12 : start + 32 * (i + 1)].hex()
+        for i in range(length)
+    )
@@ -0,0 +1,94 @@
+"""
+Compare the allocation policies of ``LenderDebtManager`` on the mock strategies.
+
+    ape run benchmark_policies --network ethereum:local:hardhat --strategies 8 --chunks 10 --chunks 50
+
+Every policy gets a fresh deployment with the same curves, all the debt parked
+in the first strategy and as much again left idle. The keeper then calls
+``updateAllocations`` for ``--rounds`` rounds. The gas they used and the
+blended APR they reached are printed next to the offline optimum.
+"""
+import random
+
+import click
+from ape import accounts, project
+from ape.cli import NetworkBoundCommand, network_option
+
+from scripts._allocation import (
+    APR_PRECISION,
+    blended_apr,
+    optimal_allocation,
+    random_curves,
+)
+from scripts._devnet import current_debts, deploy_periphery, deposit
+from scripts._metrics import format_table
+
+
+@click.command(cls=NetworkBoundCommand)
+@network_option()
+@click.option("--strategies", default=5, help="Number of mock strategies.")
+@click.option("--rounds", default=3, help="updateAllocations calls per policy.")
+@click.option(
+    "--chunks",
+    multiple=True,
+    type=int,
+    default=(10, 50),
+    help="Chunks of a MarginalAprPolicy to compare, repeatable.",
+)
+@click.option("--seed", default=0, help="Seed of the generated curves.")
+def cli(network, strategies, rounds, chunks, seed):
+    deployer, keeper = accounts.test_accounts[:2]
+    curves = random_curves(random.Random(seed), strategies, 6)
+
+    policies = [("built-in", None)] + [
+        (f"marginal APR x{count}", count) for count in chunks
+    ]
+    rows = []
+    for label, policy_chunks in policies:
+        deployment = deploy_periphery(deployer, curves, keeper=keeper)
+        if policy_chunks is not None:
+            policy = deployer.deploy(project.MarginalAprPolicy, policy_chunks)
+            deployment.debt_manager.setAllocationPolicy(policy, sender=deployer)
+
+        unit = 10 ** deployment.asset.decimals()
+        per_strategy = 1_000_000 * unit
+        deposit(deployer, deployment, 2 * per_strategy * strategies)
+        deployment.vault.update_debt(
+            deployment.strategies[0].address,
+            per_strategy * strategies,
+            sender=deployer,
+        )
+
+        gas = [
+            deployment.debt_manager.updateAllocations(sender=keeper).gas_used
+            for _ in range(rounds)
+        ]
+
+        debts = current_debts(deployment)
+        idle = deployment.vault.total_idle()
+        achieved = blended_apr(curves, debts, idle)
+        total = sum(debts) + idle
+        best = optimal_allocation(curves, total)
+        optimum = blended_apr(curves, best, total - sum(best))
+        rows.append(
+            [
+                label,
+                gas[0],
+                sum(gas),
+                f"{achieved / APR_PRECISION:.4%}",
+                f"{achieved / optimum if optimum else 0:.4f}",
+            ]
+        )
+
+    click.echo(
+        format_table(
+            [
+                "policy",
+                "first call gas",
+                f"gas over {rounds}",
+                "blended APR",
+                "quality",
+            ],
+            rows,
+        )
+    )
@@ -0,0 +1,71 @@
+"""
+Compare reading the allocation state through ape contract objects with the
+batched raw ``eth_call`` path of ``scripts/_state_reader.py``.
+
+    ape run benchmark_reader --network ethereum:local:hardhat --strategies 20 --reads 50
+"""
+import time
+
+import click
+from ape import accounts, chain
+from ape.cli import NetworkBoundCommand, network_option
+
+from scripts._allocation import APR_PRECISION, LinearCurve
+from scripts._devnet import deploy_periphery, deposit
+from scripts._metrics import format_table
+from scripts._state_reader import StateReader
+
+
+@click.command(cls=NetworkBoundCommand)
+@network_option()
+@click.option("--strategies", default=10, help="Number of mock strategies.")
+@click.option("--reads", default=20, help="Snapshots read by each path.")
+def cli(network, strategies, reads):
+    deployer = accounts.test_accounts[0]
+    curves = [
+        LinearCurve(base=5 * APR_PRECISION // 100, slope=(i + 1) * 10**8)
+        for i in range(strategies)
+    ]
+    deployment = deploy_periphery(deployer, curves)
+    unit = 10 ** deployment.asset.decimals()
+    deposit(deployer, deployment, 1_000_000 * unit * strategies)
+    for strategy in deployment.strategies:
+        deployment.vault.update_debt(strategy.address, 500_000 * unit, sender=deployer)
+
+    reader = StateReader.from_provider(
+        chain.provider, deployment.debt_manager, deployment.vault
+    )
+
+    def read_with_ape():
+        vault = deployment.vault
+        addresses = deployment.debt_manager.getStrategies()
+        params = [vault.strategies(address) for address in addresses]
+        aprs = [
+            deployment.strategies[i].aprAfterDebtChange(0)
+            for i in range(len(addresses))
+        ]
+        return vault.total_idle(), vault.totalAssets(), params, aprs
+
+    # both paths must agree before timing them
+    idle, assets, params, aprs = read_with_ape()
+    snapshot = reader.read()
+    assert snapshot.total_idle == idle and snapshot.total_assets == assets
+    assert list(snapshot.current_debt) == [p.current_debt for p in params]
+    assert list(snapshot.apr) == aprs
+
+    rows = []
+    for label, read in (
+        ("ape objects", read_with_ape),
+        ("batched eth_call", reader.read),
+    ):
+        start = time.perf_counter()
+        for _ in range(reads):
+            read()
+        elapsed = time.perf_counter() - start
+        rows.append(
+            [label, reads, f"{elapsed / reads * 1000:.1f}", f"{reads / elapsed:.1f}"]
+        )
+
+    speedup = float(rows[1][3]) / float(rows[0][3])
+    click.echo(format_table(["path", "snapshots", "ms/snapshot", "snapshots/s"], rows))
+    click.echo(f"\n{strategies} strategies, batched path {speedup:.1f}x faster")
@@ -0,0 +1,109 @@
+"""
+Fit the gas model of ``scripts/_gas_model.py`` on a local chain.
+
+    ape run calibrate_gas_model --network ethereum:local:hardhat --output gas_model.json
+
+Runs ``updateAllocations`` through a drain-and-deposit rebalance and a plain
+deposit for every strategy count up to ``--strategies``, profiles each one and
+fits the per-call costs. Then prints what the fitted model predicts for every
+sample next to the gas actually used.
+"""
+from pathlib import Path
+
+import click
+from ape import accounts
+from ape.cli import NetworkBoundCommand, network_option
+
+from scripts._allocation import APR_PRECISION, LinearCurve
+from scripts._devnet import current_debts, deploy_periphery, deposit
+from scripts._gas_model import AllocatorState, GasModel, StrategyState, simulate
+from scripts._gas_profile import GasProfiler
+from scripts._metrics import format_table
+
+
+@click.command(cls=NetworkBoundCommand)
+@network_option()
+@click.option("--strategies", default=6, help="Largest number of mock strategies.")
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write the fitted model as JSON, for GasModel.load.",
+)
+def cli(network, strategies, output):
+    deployer, keeper = accounts.test_accounts[:2]
+
+    runs = []
+    for count in range(1, strategies + 1):
+        for rebalance in (True, False):
+            runs.append((count, rebalance, *_run(deployer, keeper, count, rebalance)))
+
+    model = GasModel.fit([(count, breakdown) for count, _, _, breakdown in runs])
+
+    rows = []
+    for count, rebalance, state, breakdown in runs:
+        predicted = simulate(state, model)
+        error = (predicted.gas - breakdown.gas_used) / breakdown.gas_used
+        rows.append(
+            [
+                count,
+                "rebalance" if rebalance else "deposit",
+                predicted.external_calls,
+                breakdown.gas_used,
+                predicted.gas,
+                f"{error:+.1%}",
+            ]
+        )
+
+    click.echo(
+        format_table(
+            ["strategies", "path", "calls", "gas used", "predicted", "error"], rows
+        )
+    )
+
+    if output:
+        model.save(output)
+        click.echo(f"\nmodel written to {output}")
+
+
+def _run(deployer, keeper, count, rebalance):
+    # steeper slopes for later strategies: the last one is the lowest
+    curves = [
+        LinearCurve(base=5 * APR_PRECISION // 100, slope=(i + 1) * 10**8)
+        for i in range(count)
+    ]
+    deployment = deploy_periphery(deployer, curves, keeper=keeper)
+    unit = 10 ** deployment.asset.decimals()
+    per_strategy = 1_000_000 * unit
+
+    deposit(deployer, deployment, per_strategy * count)
+    if rebalance:
+        for strategy in deployment.strategies:
+            deployment.vault.update_debt(
+                strategy.address, per_strategy, sender=deployer
+            )
+
+        # an unrealised gain on the lowest forces the report
+        lowest = deployment.strategies[-1]
+        deployment.asset.mint(lowest.address, per_strategy // 100, sender=deployer)
+
+    debts = current_debts(deployment)
+    state = AllocatorState(
+        strategies=tuple(
+            StrategyState(
+                curve,
+                debt,
+                needs_report=rebalance and i == count - 1,
+            )
+            for i, (curve, debt) in enumerate(zip(curves, debts))
+        ),
+        idle=deployment.vault.total_idle(),
+    )
+
+    profiler = GasProfiler()
+    profiler.register(deployment.debt_manager)
+    profiler.register(deployment.vault, "vault")
+    for strategy in deployment.strategies:
+        profiler.register(strategy, "strategy")
+
+    receipt = deployment.debt_manager.updateAllocations(sender=keeper)
+    return state, profiler.breakdown(receipt, f"{count} strategies")
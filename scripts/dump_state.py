@@ -0,0 +1,41 @@
+"""
+Dump the state behind a debt manager's allocation decisions to a file.
+
+    ape run dump_state --network ethereum:mainnet-fork:hardhat \
+        --debt-manager 0x... --block 17000000 --output incident.json.gz
+
+Replay it offline with ``scripts/replay_state.py``.
+"""
+from pathlib import Path
+
+import click
+from ape import chain, project
+from ape.cli import NetworkBoundCommand, network_option
+
+from scripts._state_dump import dump_state
+from scripts._state_reader import StateReader
+
+
+@click.command(cls=NetworkBoundCommand)
+@network_option()
+@click.option("--debt-manager", required=True, help="LenderDebtManager address.")
+@click.option("--block", type=int, help="Block to dump, latest by default.")
+@click.option("--samples", default=16, help="APR samples per strategy curve.")
+@click.option(
+    "--output",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Dump file, gzipped when it ends in .gz.",
+)
+def cli(network, debt_manager, block, samples, output):
+    debt_manager = project.LenderDebtManager.at(debt_manager)
+    reader = StateReader.from_provider(
+        chain.provider, debt_manager, debt_manager.vault()
+    )
+
+    dump = dump_state(reader, block, samples)
+    dump.save(output)
+    click.echo(
+        f"block {dump.block}: {len(dump.strategies)} strategies, "
+        f"{dump.total_idle} idle, written to {output}"
+    )
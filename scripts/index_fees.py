@@ -0,0 +1,60 @@
+"""
+Follow an accountant and its vaults, appending every fee event to a ledger.
+
+    ape run index_fees --network ethereum:mainnet:infura \
+        --accountant 0x... --vault 0x... --vault 0x... \
+        --ledger fees.jsonl --from-block 17000000 --follow
+
+Restarting with the same ledger resumes where it stopped. The running
+per-strategy totals are printed as JSON after every sync.
+"""
+import json
+import time
+from pathlib import Path
+
+import click
+from ape import chain
+from ape.cli import NetworkBoundCommand, network_option
+
+from scripts._fee_ledger import FeeIndexer, Ledger
+
+
+@click.command(cls=NetworkBoundCommand)
+@network_option()
+@click.option("--accountant", required=True, help="SimpleRefundsAccountant address.")
+@click.option("--vault", "vaults", multiple=True, required=True, help="Vault address.")
+@click.option(
+    "--ledger",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Append-only JSON lines file.",
+)
+@click.option("--from-block", default=0, help="First block, when the ledger is new.")
+@click.option("--confirmations", default=12, help="Blocks to stay behind the head.")
+@click.option("--step", default=1_000, help="Blocks per eth_getLogs request.")
+@click.option("--follow", is_flag=True, help="Keep polling for new blocks.")
+@click.option("--interval", default=12.0, help="Seconds between polls.")
+def cli(
+    network,
+    accountant,
+    vaults,
+    ledger,
+    from_block,
+    confirmations,
+    step,
+    follow,
+    interval,
+):
+    indexer = FeeIndexer(
+        chain.provider.web3.provider.endpoint_uri,
+        accountant.lower(),
+        [vault.lower() for vault in vaults],
+    )
+    ledger = Ledger(ledger)
+
+    while True:
+        indexer.sync(ledger, from_block, confirmations, step)
+        click.echo(json.dumps(ledger.totals()))
+        if not follow:
+            break
+        time.sleep(interval)
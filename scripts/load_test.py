@@ -0,0 +1,134 @@
+"""
+Drive the periphery the way it runs in production: many depositors, many
+strategies and frequent keeper calls, all on a local development chain.
+
+    ape run load_test --network ethereum:local:hardhat --strategies 10
+"""
+import random
+import time
+
+import click
+from ape import accounts, chain
+from ape.cli import NetworkBoundCommand, network_option
+from ape.exceptions import ContractLogicError
+
+from scripts._allocation import (
+    APR_PRECISION,
+    blended_apr,
+    optimal_allocation,
+    random_curves,
+)
+from scripts._devnet import current_debts, deploy_periphery, deposit
+from scripts._metrics import GasRecorder, format_table
+
+DAY = 86400
+YEAR = 365 * DAY
+
+# relative weight of every operation in the generated flow
+OPERATIONS = {
+    "deposit": 40,
+    "withdraw": 25,
+    "process_report": 20,
+    "updateAllocations": 15,
+}
+
+
+@click.command(cls=NetworkBoundCommand)
+@network_option()
+@click.option("--strategies", default=5, help="Number of mock strategies.")
+@click.option("--operations", default=2_000, help="Number of operations to run.")
+@click.option("--depositors", default=8, help="Number of depositing accounts.")
+@click.option("--seed", default=0, help="Seed of the generated flow.")
+def cli(network, strategies, operations, depositors, seed):
+    rng = random.Random(seed)
+    deployer, keeper, *users = accounts.test_accounts
+    users = users[: max(min(depositors, len(users)), 1)]
+
+    deployment = deploy_periphery(
+        deployer, random_curves(rng, strategies, 6), keeper=keeper
+    )
+    vault = deployment.vault
+    unit = 10 ** deployment.asset.decimals()
+    strategy_addresses = [s.address for s in deployment.strategies]
+
+    recorder = GasRecorder()
+    labels = list(OPERATIONS)
+    weights = list(OPERATIONS.values())
+
+    click.echo(f"Running {operations} operations against {strategies} strategies")
+    start = time.perf_counter()
+    for _ in range(operations):
+        label = rng.choices(labels, weights)[0]
+        try:
+            receipt = _run(label, rng, deployment, deployer, keeper, users, unit)
+        except ContractLogicError:
+            recorder.record_failure(label)
+            continue
+
+        if receipt is not None:
+            recorder.record(label, receipt)
+
+    elapsed = time.perf_counter() - start
+
+    click.echo(recorder.table())
+    click.echo(
+        f"\n{recorder.transactions} txs in {elapsed:.1f}s "
+        f"({recorder.transactions / elapsed:.2f} tx/s)\n"
+    )
+
+    debts = current_debts(deployment)
+    idle = vault.total_idle()
+    total = sum(debts) + idle
+    optimum = optimal_allocation(deployment.curves, total)
+    achieved_apr = blended_apr(deployment.curves, debts, idle)
+    optimal_apr = blended_apr(deployment.curves, optimum, total - sum(optimum))
+
+    rows = [
+        [address, debt // unit, best // unit]
+        for address, debt, best in zip(strategy_addresses, debts, optimum)
+    ]
+    rows.append(["idle", idle // unit, (total - sum(optimum)) // unit])
+    click.echo(format_table(["strategy", "debt", "optimal debt"], rows))
+    click.echo(
+        f"\nblended APR {achieved_apr / APR_PRECISION:.4%} "
+        f"vs optimal {optimal_apr / APR_PRECISION:.4%} "
+        f"(quality {achieved_apr / optimal_apr if optimal_apr else 0:.4f})"
+    )
+
+
+def _run(label, rng, deployment, deployer, keeper, users, unit):
+    vault = deployment.vault
+
+    if label == "deposit":
+        user = rng.choice(users)
+        return deposit(user, deployment, rng.randint(1_000, 100_000) * unit)
+
+    if label == "withdraw":
+        user = rng.choice(users)
+        assets = vault.convertToAssets(vault.balanceOf(user))
+        if assets == 0:
+            return None
+
+        amount = assets * rng.randint(1, 100) // 100
+        return vault.withdraw(
+            amount,
+            user.address,
+            user.address,
+            [s.address for s in deployment.strategies],
+            sender=user,
+        )
+
+    if label == "process_report":
+        i = rng.randrange(len(deployment.strategies))
+        strategy = deployment.strategies[i]
+        debt = vault.strategies(strategy.address).current_debt
+        if debt == 0:
+            return None
+
+        # accrue a day of interest at the strategy's current rate
+        chain.pending_timestamp += DAY
+        gain = debt * deployment.curves[i].apr(debt) // APR_PRECISION * DAY // YEAR
+        deployment.asset.mint(strategy.address, gain, sender=deployer)
+        return vault.process_report(strategy.address, sender=deployer)
+
+    return deployment.debt_manager.updateAllocations(sender=keeper)
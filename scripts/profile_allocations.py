@@ -0,0 +1,62 @@
+"""
+Run ``updateAllocations`` on a local chain and break its gas down per call.
+
+    ape run profile_allocations --network ethereum:local:hardhat --strategies 5
+
+The lowest-APR strategy gets an unrealised gain first, so the trace goes
+through the full tend / report / update_debt path before the idle is
+redeployed.
+"""
+from pathlib import Path
+
+import click
+from ape import accounts
+from ape.cli import NetworkBoundCommand, network_option
+
+from scripts._allocation import APR_PRECISION, LinearCurve
+from scripts._devnet import deploy_periphery, deposit
+from scripts._gas_profile import GasProfiler, folded_stacks, render_breakdown
+
+
+@click.command(cls=NetworkBoundCommand)
+@network_option()
+@click.option("--strategies", default=3, help="Number of mock strategies.")
+@click.option(
+    "--folded",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also write folded stacks, ready for flamegraph.pl or speedscope.",
+)
+def cli(network, strategies, folded):
+    deployer, keeper = accounts.test_accounts[:2]
+
+    # same base rate, steeper slopes for later strategies: the last one is the lowest
+    curves = [
+        LinearCurve(base=5 * APR_PRECISION // 100, slope=(i + 1) * 10**8)
+        for i in range(strategies)
+    ]
+    deployment = deploy_periphery(deployer, curves, keeper=keeper)
+    unit = 10 ** deployment.asset.decimals()
+
+    per_strategy = 1_000_000 * unit
+    deposit(deployer, deployment, per_strategy * strategies)
+    for strategy in deployment.strategies:
+        deployment.vault.update_debt(strategy.address, per_strategy, sender=deployer)
+
+    lowest = deployment.strategies[-1]
+    deployment.asset.mint(lowest.address, per_strategy // 100, sender=deployer)
+
+    profiler = GasProfiler()
+    profiler.watch(deployment.debt_manager, "updateAllocations")
+    profiler.register(deployment.vault, "VaultV3")
+    profiler.register(deployment.accountant)
+    profiler.register(deployment.asset)
+    for i, strategy in enumerate(deployment.strategies):
+        profiler.register(strategy, f"strategy{i}")
+
+    receipt = deployment.debt_manager.updateAllocations(sender=keeper)
+    breakdown = profiler.breakdown(receipt, "updateAllocations")
+    click.echo(render_breakdown(breakdown))
+
+    if folded:
+        folded.write_text("\n".join(folded_stacks(breakdown)) + "\n")
+        click.echo(f"\nfolded stacks written to {folded}")
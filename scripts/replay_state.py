@@ -0,0 +1,175 @@
+"""
+Replay an allocation decision from a state dump on a local chain.
+
+    ape run replay_state incident.json.gz --network ethereum:local:hardhat
+
+Every dumped strategy becomes a ``MockPiecewiseStrategy`` following the
+sampled APR curve, holding the same debt, unrealised gain and liquidity. The
+vault idle, debt limits, strategy configs, exiting flags, idle distribution and
+TWAP window are restored, then ``estimateAdjustPosition`` and
+``updateAllocations`` run against it.
+
+Some state can't be rebuilt on mocks: an allocation policy (its code isn't in
+the dump), the TWAP observation rings and the last recorded APRs. When the
+first two are set the replay refuses to run, unless ``--allow-unrestored`` is
+given. The last APRs only rank emergency redeploys, so they are just noted
+unless a dumped strategy is exiting.
+"""
+from pathlib import Path
+from typing import List
+
+import click
+from ape import accounts
+from ape.cli import NetworkBoundCommand, network_option
+
+from scripts._allocation import PiecewiseCurve
+from scripts._devnet import (
+    Deployment,
+    current_debts,
+    deploy_asset,
+    deploy_debt_manager,
+    deploy_strategy,
+    deploy_vault,
+    deposit,
+)
+from scripts._gas_model import simulate
+from scripts._metrics import format_table
+from scripts._state_dump import ZERO_ADDRESS, StateDump
+
+
+@click.command(cls=NetworkBoundCommand)
+@network_option()
+@click.argument("dump_file", type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--estimate-only", is_flag=True, help="Stop after estimateAdjustPosition."
+)
+@click.option(
+    "--allow-unrestored",
+    is_flag=True,
+    help="Replay even when part of the dumped state can't be restored.",
+)
+def cli(network, dump_file, estimate_only, allow_unrestored):
+    dump = StateDump.load(dump_file)
+    unrestored = _unrestored(dump)
+    if unrestored and not allow_unrestored:
+        raise click.ClickException(
+            "the replay would differ from the dump, pass --allow-unrestored to "
+            "run it anyway:\n" + "\n".join(unrestored)
+        )
+    for reason in unrestored + _notes(dump):
+        click.echo(f"not restored: {reason}")
+
+    deployer, keeper = accounts.test_accounts[:2]
+    deployment = _seed(deployer, keeper, dump)
+    debt_manager = deployment.debt_manager
+
+    estimate = debt_manager.estimateAdjustPosition()
+    click.echo(
+        f"replaying block {dump.block}\n"
+        f"lowest {estimate._lowest} ({estimate._lowestApr}), "
+        f"highest {estimate._highest} ({estimate._potential})"
+    )
+    if estimate_only:
+        return
+
+    before = current_debts(deployment)
+    predicted = simulate(dump.allocator_state())
+    receipt = debt_manager.updateAllocations(sender=keeper)
+    after = current_debts(deployment)
+
+    rows = [
+        [i, s.address, debt, new_debt, new_debt - debt]
+        for i, (s, debt, new_debt) in enumerate(zip(dump.strategies, before, after))
+    ]
+    click.echo(format_table(["#", "strategy", "debt", "after", "change"], rows))
+    click.echo(
+        f"\n{receipt.gas_used:,} gas ({predicted.gas:,} predicted), "
+        f"{deployment.vault.total_idle()} idle left"
+    )
+
+
+def _seed(deployer, keeper, dump: StateDump) -> Deployment:
+    asset = deploy_asset(deployer, dump.decimals)
+    vault = deploy_vault(deployer, asset)
+    curves = [PiecewiseCurve(s.curve) for s in dump.strategies]
+    strategies = [
+        deploy_strategy(deployer, vault, curve, f"replay{i}")
+        for i, curve in enumerate(curves)
+    ]
+    debt_manager = deploy_debt_manager(deployer, vault, strategies, keeper)
+    deployment = Deployment(asset, vault, strategies, curves, debt_manager, None)
+
+    # flagged while there is nothing to drain or redeploy yet, so it moves no funds
+    for strategy, s in zip(strategies, dump.strategies):
+        if s.exiting:
+            debt_manager.emergencyExit(strategy, sender=deployer)
+
+    deposit(
+        deployer,
+        deployment,
+        dump.total_idle + sum(s.current_debt for s in dump.strategies),
+    )
+    for strategy, s in zip(strategies, dump.strategies):
+        if s.current_debt:
+            vault.update_debt(strategy.address, s.current_debt, sender=deployer)
+        # limits go in last, the dumped debt may already be above them
+        vault.update_max_debt_for_strategy(
+            strategy.address, s.max_debt, sender=deployer
+        )
+
+        if s.total_assets > s.current_debt:
+            asset.mint(
+                strategy.address, s.total_assets - s.current_debt, sender=deployer
+            )
+        elif s.total_assets < s.current_debt:
+            click.echo(f"{s.address}: unrealised loss not replayed")
+
+        if s.max_withdraw < s.total_assets:
+            strategy.setLiquidity(s.max_withdraw, sender=deployer)
+
+        debt_manager.setStrategyConfig(
+            strategy,
+            s.enabled,
+            s.min_allocation_bps,
+            s.max_allocation_bps,
+            s.priority,
+            sender=deployer,
+        )
+
+    vault.set_minimum_total_idle(dump.minimum_total_idle, sender=deployer)
+    debt_manager.setIdleDistribution(
+        dump.idle_split_count, dump.idle_chunks, sender=deployer
+    )
+    debt_manager.setTwapWindow(dump.twap_window, sender=deployer)
+    return deployment
+
+
+def _unrestored(dump: StateDump) -> List[str]:
+    """The dumped state ``_seed`` can't bring back, empty when the replay is exact."""
+    reasons = []
+    if dump.allocation_policy != ZERO_ADDRESS:
+        reasons.append(
+            f"allocation policy {dump.allocation_policy}, the built-in one runs"
+        )
+
+    observed = [s.address for s in dump.strategies if s.observations]
+    if dump.twap_window and observed:
+        reasons.append(
+            f"APR observations of {len(observed)} strategies, a "
+            f"{dump.twap_window}s TWAP window falls back to spot APRs"
+        )
+
+    recorded = [s.address for s in dump.strategies if s.last_apr]
+    if recorded and any(s.exiting for s in dump.strategies):
+        reasons.append(
+            f"last APR of {len(recorded)} strategies, emergency redeploys rank by it"
+        )
+    return reasons
+
+
+def _notes(dump: StateDump) -> List[str]:
+    """The dumped state ``_seed`` drops without changing this replay."""
+    recorded = [s.address for s in dump.strategies if s.last_apr]
+    if recorded and not any(s.exiting for s in dump.strategies):
+        return [f"last APR of {len(recorded)} strategies, no strategy is exiting"]
+    return []
@@ -0,0 +1,169 @@
+"""
+Play the scenario corpus against ``LenderDebtManager`` and gate on regressions.
+
+    ape run run_scenarios --network ethereum:local:hardhat
+    ape run run_scenarios --network ethereum:local:hardhat --policy-chunks 20
+    ape run run_scenarios --network ethereum:local:hardhat --update-baseline
+    ape run run_scenarios --network ethereum:local:hardhat --model
+
+Every scenario of ``--corpus`` gets a fresh deployment seeded with its debts,
+idle and limits, then runs its flow. The blended APR it ends with is scored
+against the offline optimum, and the gas of its ``updateAllocations`` calls is
+added up. ``--model`` plays the flows on the Python mirrors of the allocator
+instead, which gives the quality but no gas. Fails when a scenario scores
+under its ``min_quality``, has no recorded baseline, or loses more quality
+than ``--quality-tolerance`` or gains more gas than ``--gas-tolerance``
+against it.
+"""
+from pathlib import Path
+
+import click
+from ape import accounts, project
+from ape.cli import NetworkBoundCommand, network_option
+
+from scripts._allocation import APR_PRECISION
+from scripts._devnet import current_debts, deploy_periphery, deposit
+from scripts._metrics import format_table
+from scripts._scenarios import (
+    BASELINE,
+    load_baseline,
+    load_corpus,
+    play_model,
+    regressions,
+    save_baseline,
+    score,
+)
+
+
+@click.command(cls=NetworkBoundCommand)
+@network_option()
+@click.option(
+    "--corpus",
+    default="scenarios/v1",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Directory of scenario files.",
+)
+@click.option("--only", multiple=True, help="Scenario to run, repeatable.")
+@click.option(
+    "--policy-chunks",
+    type=int,
+    help="Allocate with a MarginalAprPolicy of this many chunks.",
+)
+@click.option(
+    "--min-quality",
+    type=float,
+    help="Floor for every scenario, instead of the min_quality each one sets.",
+)
+@click.option("--model", is_flag=True, help="Play on the Python mirrors, no gas.")
+@click.option("--quality-tolerance", default=0.001, help="Quality that may be lost.")
+@click.option("--gas-tolerance", default=0.05, help="Relative gas increase allowed.")
+@click.option("--update-baseline", is_flag=True, help="Record these scores instead.")
+def cli(
+    network,
+    corpus,
+    only,
+    policy_chunks,
+    min_quality,
+    model,
+    quality_tolerance,
+    gas_tolerance,
+    update_baseline,
+):
+    deployer, keeper = accounts.test_accounts[:2]
+    policy = "built-in" if policy_chunks is None else f"marginal-apr-{policy_chunks}"
+
+    scenarios = [s for s in load_corpus(corpus) if not only or s.name in only]
+    scores = {}
+    for scenario in scenarios:
+        click.echo(f"{scenario.name}: {len(scenario.strategies)} strategies")
+        if model:
+            scores[scenario.name] = play_model(scenario, policy_chunks)
+        else:
+            scores[scenario.name] = _play(deployer, keeper, scenario, policy_chunks)
+    floors = {
+        s.name: s.min_quality if min_quality is None else min_quality for s in scenarios
+    }
+
+    click.echo(
+        format_table(
+            ["scenario", "gas", "quality", "achieved APR", "optimal APR"],
+            [
+                [
+                    name,
+                    "-" if s.gas is None else s.gas,
+                    f"{s.quality:.6f}",
+                    f"{s.achieved_apr / APR_PRECISION:.4%}",
+                    f"{s.optimal_apr / APR_PRECISION:.4%}",
+                ]
+                for name, s in scores.items()
+            ],
+        )
+    )
+
+    baseline_path = corpus / BASELINE
+    baseline = load_baseline(baseline_path)
+    if update_baseline:
+        low = [name for name, s in scores.items() if s.quality < floors[name]]
+        if low:
+            raise click.ClickException(
+                f"not recording, under the quality floor: {', '.join(low)}"
+            )
+        save_baseline(baseline_path, baseline, policy, scores)
+        click.echo(f"\n{policy} baseline written to {baseline_path}")
+        return
+
+    failures = regressions(
+        baseline.get(policy, {}),
+        scores,
+        quality_tolerance,
+        gas_tolerance,
+        floors,
+    )
+    if failures:
+        raise click.ClickException(
+            f"{policy} regressions, record an intended change with "
+            "--update-baseline:\n" + "\n".join(failures)
+        )
+
+
+def _play(deployer, keeper, scenario, policy_chunks):
+    deployment = deploy_periphery(
+        deployer, scenario.curves, scenario.decimals, keeper=keeper
+    )
+    vault, debt_manager = deployment.vault, deployment.debt_manager
+
+    deposit(
+        deployer,
+        deployment,
+        sum(s.debt for s in scenario.strategies) + scenario.idle,
+    )
+    for strategy, spec in zip(deployment.strategies, scenario.strategies):
+        if spec.debt:
+            vault.update_debt(strategy.address, spec.debt, sender=deployer)
+        if spec.max_debt is not None:
+            vault.update_max_debt_for_strategy(
+                strategy.address, spec.max_debt, sender=deployer
+            )
+    if scenario.minimum_idle:
+        vault.set_minimum_total_idle(scenario.minimum_idle, sender=deployer)
+    debt_manager.setIdleDistribution(*scenario.idle_split, sender=deployer)
+    if policy_chunks is not None:
+        policy = deployer.deploy(project.MarginalAprPolicy, policy_chunks)
+        debt_manager.setAllocationPolicy(policy, sender=deployer)
+
+    gas = 0
+    for step in scenario.flows:
+        if step.action == "deposit":
+            deposit(deployer, deployment, step.amount)
+        elif step.action == "withdraw":
+            vault.withdraw(
+                step.amount,
+                deployer.address,
+                deployer.address,
+                [s.address for s in deployment.strategies],
+                sender=deployer,
+            )
+        else:
+            gas += debt_manager.updateAllocations(sender=keeper).gas_used
+
+    return score(scenario, current_debts(deployment), vault.total_idle(), gas)
@@ -1,12 +1,67 @@
+from pathlib import Path
+
 import pytest
-from ape import Contract, accounts, project
+from utils.compile_cache import compile_if_stale
 from utils.constants import MAX_INT, ROLES, WEEK
+from utils.timing import ModuleTimings
+
+# Nothing here touches the project or the network at import time: contracts are
+# resolved inside the fixtures, so collecting the suite stays cheap.
 
 # this should be the address of the ERC-20 used by the strategy/vault
 ASSET_ADDRESS = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"  # USDC
 ASSET_WHALE_ADDRESS = "0x0A59649758aa4d66E25f08Dd01271e891fe52199"  # USDC WHALE
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--module-timings",
+        action="store_true",
+        default=False,
+        help="Report the time spent in every test module.",
+    )
+    parser.addoption(
+        "--gas-breakdown",
+        action="store_true",
+        default=False,
+        help="Print the per-call gas breakdown of every updateAllocations.",
+    )
+
+
+def pytest_configure(config):
+    # compile once up front rather than in every xdist worker, and only if needed
+    if not hasattr(config, "workerinput") and not config.option.collectonly:
+        compile_if_stale(Path(config.rootpath))
+
+    # only the xdist controller (or a serial run) prints the summary
+    if config.getoption("module_timings") and not hasattr(config, "workerinput"):
+        config.pluginmanager.register(ModuleTimings(), "module-timings")
+
+    # workers trace and report, the controller (or a serial run) prints
+    if config.getoption("gas_breakdown"):
+        from utils.gas_breakdown import GasBreakdownReport
+
+        config.pluginmanager.register(GasBreakdownReport(), "gas-breakdown")
+
+
+@pytest.fixture(scope="session")
+def gas_breakdown_report(request):
+    yield request.config.pluginmanager.get_plugin("gas-breakdown")
+
+
+@pytest.fixture(autouse=True)
+def trace_gas_breakdown(request, gas_breakdown_report):
+    # only ask for the chain when tracing, tests that need no node get none
+    if gas_breakdown_report is None:
+        yield
+        return
+
+    chain = request.getfixturevalue("chain")
+    first_block = chain.blocks.height + 1
+    yield
+    gas_breakdown_report.collect(request.node, chain, first_block, chain.blocks.height)
+
+
 @pytest.fixture(scope="session")
 def gov(accounts):
     # TODO: can be changed to actual governance
@@ -30,11 +85,15 @@ def fee_manager(accounts):
 
 @pytest.fixture(scope="session")
 def asset():
+    from ape import Contract
+
     yield Contract(ASSET_ADDRESS)
 
 
 @pytest.fixture(scope="session")
 def whale():
+    from ape import Contract
+
     yield Contract(ASSET_WHALE_ADDRESS)
 
 
@@ -88,6 +147,36 @@ def create_strategy(project, strategist):
     yield create_strategy
 
 
+@pytest.fixture
+def create_kinked_strategy(project, strategist):
+    def create_kinked_strategy(
+        vault, base_rate, slope1, slope2, kink, borrowed, other_supply
+    ):
+        return strategist.deploy(
+            project.MockKinkedStrategy,
+            vault,
+            "kinked",
+            base_rate,
+            slope1,
+            slope2,
+            kink,
+            borrowed,
+            other_supply,
+        )
+
+    yield create_kinked_strategy
+
+
+@pytest.fixture
+def create_piecewise_strategy(project, strategist):
+    def create_piecewise_strategy(vault, assets_points, apr_points):
+        return strategist.deploy(
+            project.MockPiecewiseStrategy, vault, "piecewise", assets_points, apr_points
+        )
+
+    yield create_piecewise_strategy
+
+
 @pytest.fixture(scope="function")
 def create_mock_strategy(project, gov, asset):
     def create_mock_strategy(vault):
@@ -107,17 +196,22 @@ def create_accountant(fee_manager):
 
 
 @pytest.fixture(scope="function")
-def simple_refunds_accountant(
-    create_accountant, accountant=project.SimpleRefundsAccountant
-):
-    yield create_accountant(accountant)
+def simple_refunds_accountant(project, create_accountant):
+    yield create_accountant(project.SimpleRefundsAccountant)
 
 
 @pytest.fixture
-def setup_debt_manager(project, gov):
+def setup_debt_manager(project, gov, gas_breakdown_report):
     def setup_debt_manager(vault, strategies):
         debt_manager = gov.deploy(project.LenderDebtManager, vault)
 
+        if gas_breakdown_report:
+            profiler = gas_breakdown_report.profiler
+            profiler.watch(debt_manager, "updateAllocations")
+            profiler.register(vault, "VaultV3")
+            for i, s in enumerate(strategies):
+                profiler.register(s, f"strategy{i}")
+
         vault.set_role(
             debt_manager.address,
             ROLES.DEBT_MANAGER | ROLES.ACCOUNTING_MANAGER | ROLES.KEEPER,
@@ -153,6 +247,9 @@ def create_vault_and_strategy(strategy, vault, deposit_into_vault):
 
 @pytest.fixture(scope="function")
 def deposit_into_vault(asset, gov):
+    # the whale is impersonated, which only the full account manager does
+    from ape import accounts
+
     def deposit_into_vault(vault, amount_to_deposit):
         whale = accounts[ASSET_WHALE_ADDRESS]
         asset.approve(vault.address, amount_to_deposit, sender=whale)
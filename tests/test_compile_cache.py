@@ -0,0 +1,53 @@
+from utils.compile_cache import (
+    CONFIG,
+    dependency_hash,
+    is_fresh,
+    read_stamp,
+    source_hash,
+    write_stamp,
+)
+
+
+def make_project(root):
+    (root / "contracts").mkdir(parents=True)
+    (root / "contracts" / "Vault.sol").write_text("contract Vault {}")
+    (root / CONFIG).write_text("name: test\n")
+    return root
+
+
+def test_source_hash__follows_contents_and_names(tmp_path):
+    root = make_project(tmp_path)
+    before = source_hash(root)
+
+    (root / "contracts" / "Vault.sol").write_text("contract Vault { }")
+    edited = source_hash(root)
+    (root / "contracts" / "Vault.sol").rename(root / "contracts" / "Other.sol")
+
+    assert len({before, edited, source_hash(root)}) == 3
+
+
+def test_dependency_hash__follows_config_and_packages(tmp_path):
+    root = make_project(tmp_path / "project")
+    packages = tmp_path / "packages"
+    # no packages resolved yet
+    before = dependency_hash(root, packages)
+
+    (packages / "vault" / "master").mkdir(parents=True)
+    (packages / "vault" / "master" / "vault.json").write_text("{}")
+    resolved = dependency_hash(root, packages)
+    (root / CONFIG).write_text("name: test\nsolidity:\n  version: 0.8.14\n")
+
+    assert len({before, resolved, dependency_hash(root, packages)}) == 3
+
+
+def test_stamp__fresh_until_sources_change(tmp_path):
+    root = make_project(tmp_path)
+    assert read_stamp(root) is None
+    assert not is_fresh(root)
+
+    write_stamp(root)
+    assert read_stamp(root)[0] == source_hash(root)
+    assert is_fresh(root)
+
+    (root / "contracts" / "Vault.sol").write_text("contract Vault { }")
+    assert not is_fresh(root)
@@ -1,5 +1,6 @@
+import ape
 import pytest
-from utils.constants import YEAR, ROLES
+from utils.constants import DAY, YEAR, ROLES, ZERO_ADDRESS
 
 
 def test_rebalance(
@@ -95,10 +96,54 @@ def test_rebalance__with_gain(
     asset.transfer(strategy2.address, gain, sender=whale)
 
     tx = debt_manager.updateAllocations(sender=gov)
+    assert len(list(tx.decode_logs(vault.StrategyReported))) == 1
     assert strategy1.totalAssets() == amount * 2 + gain
     assert strategy2.totalAssets() == 0
 
 
+def test_rebalance__skips_report_without_gain(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+    whale,
+):
+    def rebalance(gain):
+        vault = create_vault(asset)
+        strategy1 = create_strategy(vault, int(10**18), int(10**2))
+        strategy2 = create_strategy(vault, int(10**18), int(3 * 10**2))
+        vault.add_strategy(strategy1.address, sender=gov)
+        vault.add_strategy(strategy2.address, sender=gov)
+        deposit_into_vault(vault, 2 * amount)
+        provide_strategy_with_debt(gov, strategy1, vault, amount)
+        provide_strategy_with_debt(gov, strategy2, vault, amount)
+
+        debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+        vault.update_max_debt_for_strategy(strategy1.address, int(1e18), sender=gov)
+        vault.update_max_debt_for_strategy(strategy2.address, int(1e18), sender=gov)
+
+        if gain:
+            asset.transfer(strategy2.address, gain, sender=whale)
+
+        tx = debt_manager.updateAllocations(sender=gov)
+        assert strategy1.totalAssets() == amount * 2 + gain
+        assert strategy2.totalAssets() == 0
+        return vault, tx
+
+    vault, fresh_tx = rebalance(0)
+    assert len(list(fresh_tx.decode_logs(vault.StrategyReported))) == 0
+
+    vault, stale_tx = rebalance(amount // 100)
+    assert len(list(stale_tx.decode_logs(vault.StrategyReported))) == 1
+
+    # skipping the redundant tend and report is where the savings come from
+    assert fresh_tx.gas_used < stale_tx.gas_used
+
+
 def test_no_rebalance(
     asset,
     user,
@@ -401,3 +446,894 @@ def test_no_rebalance__adds_debt__with_min_idle(
 
     assert strategy1.totalAssets() == amount * 2 - min_idle
     assert strategy2.totalAssets() == amount
+
+
+def test_apr_after_debt_removal(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(3 * 10**2))
+    vault.add_strategy(strategy1.address, sender=gov)
+    vault.add_strategy(strategy2.address, sender=gov)
+    deposit_into_vault(vault, 2 * amount)
+    provide_strategy_with_debt(gov, strategy1, vault, amount)
+    provide_strategy_with_debt(gov, strategy2, vault, amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+
+    assert debt_manager.aprAfterDebtRemoval(strategy2, 0) == (
+        strategy2.aprAfterDebtChange(0)
+    )
+    assert debt_manager.aprAfterDebtRemoval(strategy2, amount // 2) == (
+        strategy2.aprAfterDebtChange(-(amount // 2))
+    )
+    assert debt_manager.aprAfterDebtRemoval(strategy2, amount // 2) > (
+        strategy2.aprAfterDebtChange(0)
+    )
+    # capped at the current debt
+    assert debt_manager.aprAfterDebtRemoval(strategy2, 10 * amount) == 10**18
+
+
+def test_split_idle__across_top_strategies(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(2 * 10**2))
+    strategy3 = create_strategy(vault, int(10**18), int(3 * 10**2))
+    for s in [strategy1, strategy2, strategy3]:
+        vault.add_strategy(s.address, sender=gov)
+        vault.update_max_debt_for_strategy(s.address, int(1e18), sender=gov)
+
+    deposit_into_vault(vault, 3 * amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2, strategy3])
+    debt_manager.setIdleDistribution(2, 10, sender=gov)
+
+    targets, amounts = debt_manager.estimateIdleSplit()
+    assert targets == [strategy1.address, strategy2.address]
+    # chunks go to strategy1 while its marginal APR is at least strategy2's
+    assert amounts == [3 * amount * 7 // 10, 3 * amount * 3 // 10]
+
+    debt_manager.updateAllocations(sender=gov)
+
+    assert strategy1.totalAssets() == 3 * amount * 7 // 10
+    assert strategy2.totalAssets() == 3 * amount * 3 // 10
+    assert strategy3.totalAssets() == 0
+    assert vault.total_idle() == 0
+    # better than sending everything to strategy1
+    assert strategy1.aprAfterDebtChange(0) > strategy1.aprAfterDebtChange(
+        3 * amount * 3 // 10
+    )
+
+
+def test_split_idle__respects_max_debt(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(2 * 10**2))
+    for s in [strategy1, strategy2]:
+        vault.add_strategy(s.address, sender=gov)
+        vault.update_max_debt_for_strategy(s.address, int(1e18), sender=gov)
+    vault.update_max_debt_for_strategy(strategy1.address, amount, sender=gov)
+
+    deposit_into_vault(vault, 3 * amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    debt_manager.setIdleDistribution(2, 10, sender=gov)
+    debt_manager.updateAllocations(sender=gov)
+
+    assert strategy1.totalAssets() == amount
+    assert strategy2.totalAssets() == 2 * amount
+
+
+def test_split_idle__with_min_idle(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(2 * 10**2))
+    for s in [strategy1, strategy2]:
+        vault.add_strategy(s.address, sender=gov)
+        vault.update_max_debt_for_strategy(s.address, int(1e18), sender=gov)
+
+    deposit_into_vault(vault, 3 * amount)
+    min_idle = amount // 10
+    vault.set_minimum_total_idle(min_idle, sender=gov)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    debt_manager.setIdleDistribution(2, 10, sender=gov)
+    debt_manager.updateAllocations(sender=gov)
+
+    assert vault.total_idle() == min_idle
+    assert strategy1.totalAssets() + strategy2.totalAssets() == 3 * amount - min_idle
+    assert strategy2.totalAssets() > 0
+
+
+def test_set_idle_distribution__invalid__reverts(
+    asset, create_vault, setup_debt_manager, gov
+):
+    vault = create_vault(asset)
+    debt_manager = setup_debt_manager(vault, [])
+
+    with ape.reverts("invalid distribution"):
+        debt_manager.setIdleDistribution(0, 10, sender=gov)
+
+    with ape.reverts("invalid distribution"):
+        debt_manager.setIdleDistribution(2, 0, sender=gov)
+
+
+def test_split_idle__at_call_bound__fits_block(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+):
+    split_count, chunks = 20, 80
+    vault = create_vault(asset)
+    strategies = [
+        create_strategy(vault, int(10**18), int((i + 1) * 10**2))
+        for i in range(split_count)
+    ]
+    # a cap just under four chunks makes every target take a partial round
+    for s in strategies:
+        vault.add_strategy(s.address, sender=gov)
+        vault.update_max_debt_for_strategy(
+            s.address, amount // split_count - 1, sender=gov
+        )
+
+    deposit_into_vault(vault, amount)
+    debt_manager = setup_debt_manager(vault, strategies)
+
+    bound = debt_manager.MAX_IDLE_SPLIT_CALLS()
+    assert split_count * (chunks + split_count) == bound
+    with ape.reverts("invalid distribution"):
+        debt_manager.setIdleDistribution(split_count, chunks + 1, sender=gov)
+    debt_manager.setIdleDistribution(split_count, chunks, sender=gov)
+
+    tx = debt_manager.updateAllocations(sender=gov)
+
+    assert tx.gas_used < 30_000_000
+    assert vault.total_idle() == split_count
+    for s in strategies:
+        assert vault.strategies(s.address).current_debt == amount // split_count - 1
+
+
+def test_rebalance__partial_liquidity(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(3 * 10**2))
+    vault.add_strategy(strategy1.address, sender=gov)
+    vault.add_strategy(strategy2.address, sender=gov)
+    deposit_into_vault(vault, 2 * amount)
+    provide_strategy_with_debt(gov, strategy1, vault, amount)
+    provide_strategy_with_debt(gov, strategy2, vault, amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    vault.update_max_debt_for_strategy(strategy1.address, int(1e18), sender=gov)
+    vault.update_max_debt_for_strategy(strategy2.address, int(1e18), sender=gov)
+
+    strategy2.setLiquidity(amount // 4, sender=gov)
+
+    strategies, releasable = debt_manager.getReleasableDebts()
+    assert strategies == [strategy1.address, strategy2.address]
+    assert releasable == [amount, amount // 4]
+
+    debt_manager.updateAllocations(sender=gov)
+
+    # only the liquid part of strategy2 is moved
+    assert strategy1.totalAssets() == amount + amount // 4
+    assert strategy2.totalAssets() == amount - amount // 4
+
+
+def test_no_rebalance__lowest_illiquid(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(3 * 10**2))
+    vault.add_strategy(strategy1.address, sender=gov)
+    vault.add_strategy(strategy2.address, sender=gov)
+    deposit_into_vault(vault, 2 * amount)
+    provide_strategy_with_debt(gov, strategy1, vault, amount)
+    provide_strategy_with_debt(gov, strategy2, vault, amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    vault.update_max_debt_for_strategy(strategy1.address, int(1e18), sender=gov)
+    vault.update_max_debt_for_strategy(strategy2.address, int(1e18), sender=gov)
+
+    strategy2.setLiquidity(0, sender=gov)
+
+    # strategy2 pays less but can't release anything, so it's not picked
+    tx_view = debt_manager.estimateAdjustPosition()
+    assert tx_view._lowest == 0
+    assert tx_view._highest == 0
+
+    tx = debt_manager.updateAllocations(sender=gov)
+
+    assert len(list(tx.decode_logs(vault.DebtUpdated))) == 0
+    assert strategy1.totalAssets() == amount
+    assert strategy2.totalAssets() == amount
+
+
+def test_strategy_config(asset, create_vault, create_strategy, setup_debt_manager, gov):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(2 * 10**2))
+    vault.add_strategy(strategy1.address, sender=gov)
+    vault.add_strategy(strategy2.address, sender=gov)
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+
+    config = debt_manager.strategyConfigs(strategy1)
+    assert config.enabled
+    assert config.minAllocationBps == 0
+    assert config.maxAllocationBps == 10_000
+    assert config.priority == 0
+    assert config.lastApr == 0
+
+    debt_manager.setStrategyConfig(strategy2, False, 1_000, 5_000, 3, sender=gov)
+
+    strategies, configs = debt_manager.getStrategyConfigs()
+    assert strategies == [strategy1.address, strategy2.address]
+    assert configs[0].enabled
+    assert not configs[1].enabled
+    assert configs[1].minAllocationBps == 1_000
+    assert configs[1].maxAllocationBps == 5_000
+    assert configs[1].priority == 3
+
+    debt_manager.setStrategyEnabled(strategy2, True, sender=gov)
+    assert debt_manager.strategyConfigs(strategy2).enabled
+
+    debt_manager.removeStrategy(strategy2, sender=gov)
+    assert not debt_manager.strategyConfigs(strategy2).enabled
+
+
+def test_strategy_config__invalid__reverts(
+    asset, create_vault, create_strategy, setup_debt_manager, gov
+):
+    vault = create_vault(asset)
+    strategy = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy.address, sender=gov)
+    debt_manager = setup_debt_manager(vault, [strategy])
+
+    with ape.reverts("invalid bounds"):
+        debt_manager.setStrategyConfig(strategy, True, 5_000, 1_000, 0, sender=gov)
+
+    with ape.reverts("invalid bounds"):
+        debt_manager.setStrategyConfig(strategy, True, 0, 10_001, 0, sender=gov)
+
+    with ape.reverts("unknown strategy"):
+        debt_manager.setStrategyEnabled(gov, False, sender=gov)
+
+
+def test_adds_debt__skips_disabled_strategy(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(2 * 10**2))
+    for s in [strategy1, strategy2]:
+        vault.add_strategy(s.address, sender=gov)
+        vault.update_max_debt_for_strategy(s.address, int(1e18), sender=gov)
+    deposit_into_vault(vault, amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    debt_manager.setStrategyEnabled(strategy1, False, sender=gov)
+
+    assert debt_manager.estimateAdjustPosition()._highest == 1
+
+    debt_manager.updateAllocations(sender=gov)
+
+    assert strategy1.totalAssets() == 0
+    assert strategy2.totalAssets() == amount
+    assert debt_manager.strategyConfigs(strategy2).lastApr == (
+        strategy2.aprAfterDebtChange(0)
+    )
+
+
+def test_adds_debt__capped_at_max_allocation(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(2 * 10**2))
+    for s in [strategy1, strategy2]:
+        vault.add_strategy(s.address, sender=gov)
+        vault.update_max_debt_for_strategy(s.address, int(1e18), sender=gov)
+    deposit_into_vault(vault, amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    debt_manager.setStrategyConfig(strategy1, True, 0, 4_000, 0, sender=gov)
+
+    debt_manager.updateAllocations(sender=gov)
+
+    # the rest stays idle for the next call to place elsewhere
+    assert strategy1.totalAssets() == amount * 4_000 // 10_000
+    assert vault.total_idle() == amount - amount * 4_000 // 10_000
+
+    debt_manager.updateAllocations(sender=gov)
+
+    assert strategy1.totalAssets() == amount * 4_000 // 10_000
+    assert strategy2.totalAssets() == amount - amount * 4_000 // 10_000
+
+
+def test_rebalance__keeps_min_allocation(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(3 * 10**2))
+    vault.add_strategy(strategy1.address, sender=gov)
+    vault.add_strategy(strategy2.address, sender=gov)
+    deposit_into_vault(vault, 2 * amount)
+    provide_strategy_with_debt(gov, strategy1, vault, amount)
+    provide_strategy_with_debt(gov, strategy2, vault, amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    vault.update_max_debt_for_strategy(strategy1.address, int(1e18), sender=gov)
+    vault.update_max_debt_for_strategy(strategy2.address, int(1e18), sender=gov)
+    debt_manager.setStrategyConfig(strategy2, True, 1_000, 10_000, 0, sender=gov)
+
+    lowest_apr = strategy2.aprAfterDebtChange(0)
+    debt_manager.updateAllocations(sender=gov)
+
+    min_debt = 2 * amount * 1_000 // 10_000
+    assert strategy2.totalAssets() == min_debt
+    assert strategy1.totalAssets() == 2 * amount - min_debt
+    assert debt_manager.strategyConfigs(strategy2).lastApr == lowest_apr
+
+
+def test_twap_apr(
+    chain,
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+    whale,
+):
+    vault = create_vault(asset)
+    strategy = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy.address, sender=gov)
+    deposit_into_vault(vault, amount)
+    provide_strategy_with_debt(gov, strategy, vault, amount)
+    debt_manager = setup_debt_manager(vault, [strategy])
+
+    # no history yet
+    assert debt_manager.twapApr(strategy, DAY) == strategy.aprAfterDebtChange(0)
+
+    debt_manager.pokeAprs(sender=gov)
+    first_apr = strategy.aprAfterDebtChange(0)
+
+    chain.pending_timestamp = chain.pending_timestamp + DAY
+    asset.transfer(strategy.address, amount, sender=whale)
+    debt_manager.pokeAprs(sender=gov)
+    second_apr = strategy.aprAfterDebtChange(0)
+    assert second_apr < first_apr
+
+    chain.pending_timestamp = chain.pending_timestamp + DAY
+    chain.mine(timestamp=chain.pending_timestamp)
+
+    observations = debt_manager.getObservations(strategy)
+    assert [o.apr for o in observations] == [first_apr, second_apr]
+    assert observations[1].aprCumulative == first_apr * (
+        observations[1].timestamp - observations[0].timestamp
+    )
+
+    # only the latest observation is inside the window
+    assert debt_manager.twapApr(strategy, DAY // 2) == second_apr
+    assert second_apr < debt_manager.twapApr(strategy, 2 * DAY) < first_apr
+    assert debt_manager.twapApr(strategy, 0) == second_apr
+
+
+def test_observations__wrap_around(
+    chain, asset, create_vault, create_strategy, setup_debt_manager, gov
+):
+    vault = create_vault(asset)
+    strategy = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy.address, sender=gov)
+    debt_manager = setup_debt_manager(vault, [strategy])
+    cardinality = debt_manager.OBSERVATION_CARDINALITY()
+
+    for _ in range(cardinality + 5):
+        chain.pending_timestamp = chain.pending_timestamp + 60
+        debt_manager.pokeAprs(sender=gov)
+
+    observations = debt_manager.getObservations(strategy)
+    assert len(observations) == cardinality
+    timestamps = [o.timestamp for o in observations]
+    assert timestamps == sorted(timestamps)
+    assert timestamps[-1] == chain.blocks.head.timestamp
+
+
+def test_no_rebalance__spot_apr_spike_with_twap(
+    chain,
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+    whale,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy1.address, sender=gov)
+    vault.add_strategy(strategy2.address, sender=gov)
+    deposit_into_vault(vault, 2 * amount)
+    provide_strategy_with_debt(gov, strategy1, vault, amount)
+    provide_strategy_with_debt(gov, strategy2, vault, amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    vault.update_max_debt_for_strategy(strategy1.address, int(1e18), sender=gov)
+    vault.update_max_debt_for_strategy(strategy2.address, int(1e18), sender=gov)
+
+    debt_manager.pokeAprs(sender=gov)
+    chain.pending_timestamp = chain.pending_timestamp + DAY
+
+    # the rate of strategy1 drops for a single block
+    asset.transfer(strategy1.address, 2 * amount, sender=whale)
+
+    spot = debt_manager.estimateAdjustPosition()
+    assert spot._lowest == 0
+    assert spot._potential > spot._lowestApr
+
+    debt_manager.setTwapWindow(DAY, sender=gov)
+    smoothed = debt_manager.estimateAdjustPosition()
+    assert smoothed._potential <= smoothed._lowestApr
+
+    tx = debt_manager.updateAllocations(sender=gov)
+    assert len(list(tx.decode_logs(vault.DebtUpdated))) == 0
+    assert vault.strategies(strategy1).current_debt == amount
+    assert vault.strategies(strategy2).current_debt == amount
+
+
+def test_emergency_exit(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+):
+    vault = create_vault(asset)
+    strategies = [create_strategy(vault, int(10**18), int(10**2)) for _ in range(3)]
+    for strategy in strategies:
+        vault.add_strategy(strategy.address, sender=gov)
+    deposit_into_vault(vault, 3 * amount)
+    for strategy in strategies:
+        provide_strategy_with_debt(gov, strategy, vault, amount)
+        vault.update_max_debt_for_strategy(strategy.address, int(1e18), sender=gov)
+
+    strategy1, strategy2, strategy3 = strategies
+    debt_manager = setup_debt_manager(vault, strategies)
+    debt_manager.setStrategyConfig(strategy3, True, 0, 10_000, 1, sender=gov)
+
+    tx = debt_manager.emergencyExit(strategy1, sender=gov)
+
+    # the whole exit fits in the block it was called in
+    assert vault.strategies(strategy1).current_debt == 0
+    events = list(tx.decode_logs(debt_manager.EmergencyExit))
+    assert len(events) == 1
+    assert events[0].strategy == strategy1.address
+    assert events[0].released == amount
+    assert events[0].remainingDebt == 0
+
+    # straight to the highest priority, no report and no APR evaluation
+    assert len(list(tx.decode_logs(vault.StrategyReported))) == 0
+    assert vault.strategies(strategy3).current_debt == 2 * amount
+    assert vault.strategies(strategy2).current_debt == amount
+    assert vault.total_idle() == 0
+
+    config = debt_manager.strategyConfigs(strategy1)
+    assert not config.enabled
+    assert config.exiting
+
+    # the allocator won't fund it again
+    deposit_into_vault(vault, amount)
+    debt_manager.updateAllocations(sender=gov)
+    assert vault.strategies(strategy1).current_debt == 0
+
+
+def test_emergency_exit__illiquid(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy1.address, sender=gov)
+    vault.add_strategy(strategy2.address, sender=gov)
+    deposit_into_vault(vault, 2 * amount)
+    provide_strategy_with_debt(gov, strategy1, vault, amount)
+    provide_strategy_with_debt(gov, strategy2, vault, amount)
+    vault.update_max_debt_for_strategy(strategy2.address, int(1e18), sender=gov)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    strategy1.setLiquidity(amount // 2, sender=gov)
+
+    first = debt_manager.emergencyExit(strategy1, sender=gov)
+    assert vault.strategies(strategy1).current_debt == amount - amount // 2
+
+    receipt = first
+    for _ in range(5):
+        if vault.strategies(strategy1).current_debt == 0:
+            break
+        # the lender frees more cash, the next exitAll picks it up
+        strategy1.setLiquidity(amount // 2, sender=gov)
+        receipt = debt_manager.exitAll(sender=gov)
+
+    time_to_exit = receipt.block_number - first.block_number
+    assert vault.strategies(strategy1).current_debt == 0
+    assert time_to_exit == 2
+    assert vault.strategies(strategy2).current_debt == 2 * amount
+
+
+def test_emergency_exit__reverting_lender__others_exit(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+):
+    vault = create_vault(asset)
+    strategies = [create_strategy(vault, int(10**18), int(10**2)) for _ in range(3)]
+    for strategy in strategies:
+        vault.add_strategy(strategy.address, sender=gov)
+    deposit_into_vault(vault, 3 * amount)
+    for strategy in strategies:
+        provide_strategy_with_debt(gov, strategy, vault, amount)
+        vault.update_max_debt_for_strategy(strategy.address, int(1e18), sender=gov)
+
+    strategy1, strategy2, strategy3 = strategies
+    debt_manager = setup_debt_manager(vault, strategies)
+
+    # strategy2 starts exiting while it has nothing to give back
+    strategy2.setLiquidity(0, sender=gov)
+    debt_manager.emergencyExit(strategy2, sender=gov)
+    strategy2.setLiquidity(amount, sender=gov)
+
+    # strategy1 is listed first and reverts on every call
+    strategy1.setBroken(True, sender=gov)
+    tx = debt_manager.emergencyExit(strategy1, sender=gov)
+
+    failures = list(tx.decode_logs(debt_manager.EmergencyExitFailed))
+    assert len(failures) == 1
+    assert failures[0].strategy == strategy1.address
+
+    exits = list(tx.decode_logs(debt_manager.EmergencyExit))
+    assert [e.strategy for e in exits] == [strategy2.address]
+    assert vault.strategies(strategy1).current_debt == amount
+    assert vault.strategies(strategy2).current_debt == 0
+    assert vault.strategies(strategy3).current_debt == 2 * amount
+
+
+def test_emergency_exit__gas_budget(
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+    provide_strategy_with_debt,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy1.address, sender=gov)
+    vault.add_strategy(strategy2.address, sender=gov)
+    deposit_into_vault(vault, 2 * amount)
+    provide_strategy_with_debt(gov, strategy1, vault, amount)
+    provide_strategy_with_debt(gov, strategy2, vault, amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    debt_manager.setEmergencyGasBudget(0, sender=gov)
+
+    debt_manager.emergencyExit(strategy1, sender=gov)
+
+    # the exit itself always happens, redeploying waits for the allocator
+    assert vault.strategies(strategy1).current_debt == 0
+    assert vault.strategies(strategy2).current_debt == amount
+    assert vault.total_idle() == amount
+
+
+def test_emergency_exit__not_allowed__reverts(
+    asset, create_vault, create_strategy, setup_debt_manager, gov, user
+):
+    vault = create_vault(asset)
+    strategy = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy.address, sender=gov)
+    debt_manager = setup_debt_manager(vault, [strategy])
+
+    with ape.reverts("not allowed"):
+        debt_manager.emergencyExit(strategy, sender=user)
+
+    with ape.reverts("not allowed"):
+        debt_manager.exitAll(sender=user)
+
+    with ape.reverts("unknown strategy"):
+        debt_manager.emergencyExit(user, sender=gov)
+
+
+def test_roles(asset, create_vault, create_strategy, setup_debt_manager, gov, user):
+    vault = create_vault(asset)
+    strategy = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy.address, sender=gov)
+    debt_manager = setup_debt_manager(vault, [])
+
+    assert debt_manager.governance() == gov.address
+    assert debt_manager.roles(gov) == (
+        ROLES.STRATEGY_MANAGER
+        | ROLES.DEBT_MANAGER
+        | ROLES.EMERGENCY_MANAGER
+        | ROLES.KEEPER
+    )
+
+    with ape.reverts("not allowed"):
+        debt_manager.addStrategy(strategy, sender=user)
+    with ape.reverts("not allowed"):
+        debt_manager.updateAllocations(sender=user)
+    with ape.reverts("not allowed"):
+        debt_manager.setIdleDistribution(2, 10, sender=user)
+    with ape.reverts("not governance"):
+        debt_manager.setRole(user, ROLES.KEEPER, sender=user)
+
+    tx = debt_manager.setRole(user, ROLES.KEEPER, sender=gov)
+    event = list(tx.decode_logs(debt_manager.RoleSet))[0]
+    assert event.account == user.address
+    assert event.roles == ROLES.KEEPER
+
+    # a keeper can run the allocator but not manage strategies
+    debt_manager.updateAllocations(sender=user)
+    with ape.reverts("not allowed"):
+        debt_manager.addStrategy(strategy, sender=user)
+
+    debt_manager.setRole(user, ROLES.KEEPER | ROLES.STRATEGY_MANAGER, sender=gov)
+    debt_manager.addStrategy(strategy, sender=user)
+    assert debt_manager.getStrategies() == [strategy.address]
+
+    debt_manager.setRole(user, 0, sender=gov)
+    with ape.reverts("not allowed"):
+        debt_manager.removeStrategy(strategy, sender=user)
+
+
+def test_transfer_governance(asset, create_vault, setup_debt_manager, gov, user):
+    vault = create_vault(asset)
+    debt_manager = setup_debt_manager(vault, [])
+
+    with ape.reverts("not governance"):
+        debt_manager.setFutureGovernance(user, sender=user)
+
+    debt_manager.setFutureGovernance(user, sender=gov)
+    assert debt_manager.governance() == gov.address
+
+    with ape.reverts("not future governance"):
+        debt_manager.acceptGovernance(sender=gov)
+
+    debt_manager.acceptGovernance(sender=user)
+    assert debt_manager.governance() == user.address
+    assert debt_manager.futureGovernance() == ZERO_ADDRESS
+
+    with ape.reverts("not governance"):
+        debt_manager.setRole(gov, 0, sender=gov)
+
+
+def test_add_strategy__too_many__reverts(
+    asset, create_vault, create_strategy, setup_debt_manager, gov
+):
+    vault = create_vault(asset)
+    debt_manager = setup_debt_manager(vault, [])
+    max_strategies = debt_manager.MAX_STRATEGIES()
+
+    for _ in range(max_strategies):
+        strategy = create_strategy(vault, int(10**18), int(10**2))
+        vault.add_strategy(strategy.address, sender=gov)
+        debt_manager.addStrategy(strategy, sender=gov)
+
+    strategy = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy.address, sender=gov)
+    with ape.reverts("too many strategies"):
+        debt_manager.addStrategy(strategy, sender=gov)
+
+    with ape.reverts("invalid distribution"):
+        debt_manager.setIdleDistribution(max_strategies + 1, 10, sender=gov)
+    with ape.reverts("invalid distribution"):
+        debt_manager.setIdleDistribution(
+            2, debt_manager.MAX_IDLE_CHUNKS() + 1, sender=gov
+        )
+
+
+def test_allocation_policy(
+    project,
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(3 * 10**2))
+    for s in [strategy1, strategy2]:
+        vault.add_strategy(s.address, sender=gov)
+        vault.update_max_debt_for_strategy(s.address, int(1e18), sender=gov)
+    deposit_into_vault(vault, 3 * amount)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    policy = gov.deploy(project.MarginalAprPolicy, 20)
+    tx = debt_manager.setAllocationPolicy(policy, sender=gov)
+    event = list(tx.decode_logs(debt_manager.AllocationPolicySet))
+    assert event[0].allocationPolicy == policy.address
+
+    targets = policy.targetDebts(debt_manager)
+    debt_manager.updateAllocations(sender=gov)
+
+    # the flatter curve takes more, but both end up funded
+    assert strategy1.totalAssets() == targets[0]
+    assert strategy2.totalAssets() == targets[1]
+    assert targets[0] > targets[1] > 0
+    assert targets[0] + targets[1] == 3 * amount
+    assert vault.total_idle() == 0
+    # same bookkeeping as the built-in policy
+    for s in [strategy1, strategy2]:
+        assert debt_manager.strategyConfigs(s).lastApr == s.aprAfterDebtChange(0)
+
+
+def test_allocation_policy__releases_before_depositing(
+    project,
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    provide_strategy_with_debt,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    strategy1 = create_strategy(vault, int(10**18), int(10**2))
+    strategy2 = create_strategy(vault, int(10**18), int(3 * 10**2))
+    for s in [strategy1, strategy2]:
+        vault.add_strategy(s.address, sender=gov)
+    deposit_into_vault(vault, 2 * amount)
+    provide_strategy_with_debt(gov, strategy2, vault, 2 * amount)
+    for s in [strategy1, strategy2]:
+        vault.update_max_debt_for_strategy(s.address, int(1e18), sender=gov)
+
+    debt_manager = setup_debt_manager(vault, [strategy1, strategy2])
+    debt_manager.setAllocationPolicy(
+        gov.deploy(project.MarginalAprPolicy, 20), sender=gov
+    )
+    debt_manager.updateAllocations(sender=gov)
+
+    assert strategy1.totalAssets() > strategy2.totalAssets() > 0
+    assert strategy1.totalAssets() + strategy2.totalAssets() == 2 * amount
+
+    # unset, the built-in policy is back
+    debt_manager.setAllocationPolicy(ZERO_ADDRESS, sender=gov)
+    assert debt_manager.allocationPolicy() == ZERO_ADDRESS
+
+
+def test_allocation_policy__max_strategies__fits_block(
+    project,
+    asset,
+    create_vault,
+    create_strategy,
+    setup_debt_manager,
+    deposit_into_vault,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    debt_manager = setup_debt_manager(vault, [])
+    strategies = []
+    for i in range(debt_manager.MAX_STRATEGIES() - 1):
+        strategy = create_strategy(vault, int(10**18), int((i % 7 + 1) * 10**2))
+        vault.add_strategy(strategy.address, sender=gov)
+        vault.update_max_debt_for_strategy(strategy.address, int(1e30), sender=gov)
+        debt_manager.addStrategy(strategy, sender=gov)
+        strategies.append(strategy)
+    deposit_into_vault(vault, amount)
+
+    # what run_scenarios --policy-chunks 20 does on mixed-120
+    policy = gov.deploy(project.MarginalAprPolicy, 20)
+    debt_manager.setAllocationPolicy(policy, sender=gov)
+    tx = debt_manager.updateAllocations(sender=gov)
+
+    assert tx.gas_used < 30_000_000
+    assert sum(s.totalAssets() for s in strategies) == amount
+
+
+def test_set_allocation_policy__not_allowed__reverts(
+    asset, create_vault, setup_debt_manager, gov, user
+):
+    vault = create_vault(asset)
+    debt_manager = setup_debt_manager(vault, [])
+
+    with ape.reverts("not allowed"):
+        debt_manager.setAllocationPolicy(ZERO_ADDRESS, sender=user)
@@ -0,0 +1,139 @@
+from scripts._fee_ledger import (
+    DISTRIBUTE_REWARDS,
+    STRATEGY_REPORTED,
+    UPDATE_MANAGEMENT_FEE,
+    FeeIndexer,
+    Ledger,
+    decode_log,
+)
+
+ACCOUNTANT = "0x" + "aa" * 20
+VAULT = "0x" + "bb" * 20
+STRATEGY = "0x" + "cc" * 20
+
+
+def make_log(topic, indexed, words, block, log_index, address=VAULT):
+    return {
+        "address": address,
+        "topics": [topic, "0x" + "00" * 12 + indexed[2:]],
+        "data": "0x" + b"".join(w.to_bytes(32, "big") for w in words).hex(),
+        "blockNumber": hex(block),
+        "logIndex": hex(log_index),
+        "transactionHash": "0x" + f"{block:064x}",
+    }
+
+
+def report(block, log_index, gain=100, fees=10, refunds=0):
+    return make_log(
+        STRATEGY_REPORTED, STRATEGY, [gain, 0, 1_000, fees, refunds], block, log_index
+    )
+
+
+class FakeChain(FeeIndexer):
+    """Answers the indexer's JSON-RPC from a list of logs instead of a node."""
+
+    def __init__(self, logs, head):
+        super().__init__("http://localhost", ACCOUNTANT, [VAULT])
+        self.chain_logs = logs
+        self.chain_head = head
+        self.requests = []
+
+    def _rpc(self, method, params):
+        if method == "eth_blockNumber":
+            return hex(self.chain_head)
+
+        start, end = int(params[0]["fromBlock"], 16), int(params[0]["toBlock"], 16)
+        self.requests.append((start, end))
+        return [
+            log
+            for log in self.chain_logs
+            if start <= int(log["blockNumber"], 16) <= end
+        ]
+
+
+def test_decode_log():
+    entry = decode_log(report(7, 2, gain=100, fees=10, refunds=3))
+
+    assert entry == {
+        "block": 7,
+        "log_index": 2,
+        "tx": "0x" + f"{7:064x}",
+        "kind": "report",
+        "vault": VAULT,
+        "strategy": STRATEGY,
+        "gain": 100,
+        "loss": 0,
+        "current_debt": 1_000,
+        "total_fees": 10,
+        "total_refunds": 3,
+    }
+
+    fee = decode_log(make_log(UPDATE_MANAGEMENT_FEE, STRATEGY, [250], 8, 0, ACCOUNTANT))
+    assert fee["kind"] == "management_fee"
+    assert fee["strategy"] == STRATEGY and fee["fee"] == 250
+
+    distribution = decode_log(
+        make_log(DISTRIBUTE_REWARDS, VAULT, [42], 9, 0, ACCOUNTANT)
+    )
+    assert distribution["vault"] == VAULT and distribution["rewards"] == 42
+
+
+def test_sync__totals(tmp_path):
+    logs = [
+        make_log(UPDATE_MANAGEMENT_FEE, STRATEGY, [100], 1, 0, ACCOUNTANT),
+        report(3, 0, gain=100, fees=10),
+        report(12, 1, gain=50, fees=5, refunds=2),
+        make_log(DISTRIBUTE_REWARDS, VAULT, [15], 15, 0, ACCOUNTANT),
+    ]
+    indexer = FakeChain(logs, head=20)
+    ledger = Ledger(tmp_path / "fees.jsonl")
+
+    assert indexer.sync(ledger, start=0, confirmations=2, step=5) == 18
+    assert indexer.requests == [(0, 4), (5, 9), (10, 14), (15, 18)]
+
+    totals = ledger.totals()
+    assert totals["block"] == 18
+    assert totals["strategies"][STRATEGY] == {
+        "reports": 2,
+        "gain": 150,
+        "loss": 0,
+        "fees": 15,
+        "refunds": 2,
+        "management_fee": 100,
+        "performance_fee": 0,
+    }
+    assert totals["distributed"] == {VAULT: 15}
+
+
+def test_sync__resumes_after_restart(tmp_path):
+    path = tmp_path / "fees.jsonl"
+    logs = [report(3, 0), report(8, 0)]
+    FakeChain(logs, head=5).sync(Ledger(path), start=0)
+
+    # a new block, picked up by a fresh process over the same ledger
+    indexer = FakeChain(logs, head=10)
+    ledger = Ledger(path)
+    assert ledger.cursor == 5
+    assert ledger.strategies[STRATEGY].reports == 1
+
+    indexer.sync(ledger, start=0)
+    assert indexer.requests == [(6, 10)]
+    assert ledger.strategies[STRATEGY].reports == 2
+    assert len(list(Ledger(path).entries())) == 2
+
+
+def test_append__replayed_range_is_skipped(tmp_path):
+    path = tmp_path / "fees.jsonl"
+    entries = [decode_log(report(3, 0)), decode_log(report(3, 1))]
+    Ledger(path).append(entries[:1], 3)
+
+    # crashed after the entries hit the disk but before the cursor moved
+    path.with_name(path.name + ".cursor").unlink()
+
+    ledger = Ledger(path)
+    assert ledger.cursor is None
+    ledger.append(entries, 3)
+
+    assert [e["log_index"] for e in ledger.entries()] == [0, 1]
+    assert ledger.strategies[STRATEGY].reports == 2
+    assert ledger.cursor == 3
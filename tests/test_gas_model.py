@@ -0,0 +1,65 @@
+from scripts._allocation import LinearCurve
+from scripts._gas_model import AllocatorState, StrategyState, simulate
+
+# the `amount` fixture: 1M of the 6 decimals asset
+AMOUNT = 1_000_000 * 10**6
+MAX_DEBT = 10**18
+
+
+def strategy(slope, debt=0, **kwargs):
+    return StrategyState(LinearCurve(10**18, slope), debt, MAX_DEBT, **kwargs)
+
+
+def test_simulate__rebalance():
+    # test_debt_manager::test_rebalance
+    state = AllocatorState(
+        (strategy(10**2, AMOUNT), strategy(3 * 10**2, AMOUNT)), idle=0
+    )
+
+    simulation = simulate(state)
+
+    assert (simulation.lowest, simulation.highest) == (1, 0)
+    assert simulation.debts == [2 * AMOUNT, 0]
+    assert simulation.idle == 0
+    assert simulation.calls["vault.update_debt"] == 2
+
+
+def test_simulate__partial_liquidity():
+    # test_debt_manager::test_rebalance__partial_liquidity
+    state = AllocatorState(
+        (
+            strategy(10**2, AMOUNT),
+            strategy(3 * 10**2, AMOUNT, liquidity=AMOUNT // 4),
+        ),
+        idle=0,
+    )
+
+    simulation = simulate(state)
+
+    assert simulation.debts == [AMOUNT + AMOUNT // 4, AMOUNT - AMOUNT // 4]
+    assert simulation.idle == 0
+
+
+def test_simulate__split_idle_across_top_strategies():
+    # test_debt_manager::test_split_idle__across_top_strategies
+    state = AllocatorState(
+        (strategy(10**2), strategy(2 * 10**2), strategy(3 * 10**2)),
+        idle=3 * AMOUNT,
+        idle_split_count=2,
+        idle_chunks=10,
+    )
+
+    simulation = simulate(state)
+
+    assert simulation.debts == [3 * AMOUNT * 7 // 10, 3 * AMOUNT * 3 // 10, 0]
+    assert simulation.idle == 0
+
+
+def test_simulate__without_model_has_no_gas():
+    state = AllocatorState((strategy(10**2),), idle=AMOUNT)
+
+    simulation = simulate(state, model=None)
+
+    assert simulation.debts == [AMOUNT]
+    assert simulation.gas == 0
+    assert simulation.external_calls > 0
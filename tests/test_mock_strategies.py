@@ -0,0 +1,140 @@
+import ape
+from utils.constants import MAX_INT
+
+
+def test_linear__saturates_at_zero(asset, create_vault, create_strategy):
+    vault = create_vault(asset)
+    strategy = create_strategy(vault, int(10**18), int(10**2))
+
+    assert strategy.aprAfterDebtChange(0) == 10**18
+    # base / slope * MAX_BPS assets would take the apr below zero
+    assert strategy.aprAfterDebtChange(10**20) == 0
+    assert strategy.aprAfterDebtChange(10**30) == 0
+
+
+def test_kinked__rate_jumps_after_kink(
+    asset, create_vault, create_kinked_strategy, gov
+):
+    vault = create_vault(asset)
+    base_rate = 0
+    slope1 = 4 * 10**16  # 4%
+    slope2 = 75 * 10**16  # 75%
+    kink = 8 * 10**17  # 80%
+    strategy = create_kinked_strategy(
+        vault, base_rate, slope1, slope2, kink, 80 * 10**6, 100 * 10**6
+    )
+
+    # at the kink: borrow rate 4%, supply rate 4% * 80%
+    assert strategy.utilisation(0) == kink
+    assert strategy.aprAfterDebtChange(0) == slope1 * kink // 10**18
+
+    # above the kink the supply rate grows much faster
+    strategy.setMarket(90 * 10**6, 100 * 10**6, sender=gov)
+    utilisation = 9 * 10**17
+    borrow_rate = slope1 + slope2 * (utilisation - kink) // (10**18 - kink)
+    assert strategy.aprAfterDebtChange(0) == borrow_rate * utilisation // 10**18
+
+    # more borrows than supply saturates at 100% utilisation
+    strategy.setMarket(200 * 10**6, 100 * 10**6, sender=gov)
+    assert strategy.utilisation(0) == 10**18
+    assert strategy.aprAfterDebtChange(0) == slope1 + slope2
+
+
+def test_kinked__max_withdraw_limited_to_cash(
+    asset,
+    create_vault,
+    create_kinked_strategy,
+    deposit_into_vault,
+    provide_strategy_with_debt,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    # the market lent out everything it had before the vault arrived
+    strategy = create_kinked_strategy(
+        vault, 0, 4 * 10**16, 75 * 10**16, 8 * 10**17, amount, amount
+    )
+    vault.add_strategy(strategy.address, sender=gov)
+    deposit_into_vault(vault, amount)
+    provide_strategy_with_debt(gov, strategy, vault, amount)
+
+    assert strategy.maxWithdraw(vault) == amount
+
+    strategy.setMarket(amount * 3 // 2, amount, sender=gov)
+    assert strategy.maxWithdraw(vault) == amount // 2
+
+
+def test_piecewise__interpolates_and_saturates(
+    asset, create_vault, create_piecewise_strategy
+):
+    vault = create_vault(asset)
+    strategy = create_piecewise_strategy(
+        vault, [0, 1_000, 3_000], [5 * 10**16, 3 * 10**16, 2 * 10**16]
+    )
+
+    assert strategy.aprAfterDebtChange(0) == 5 * 10**16
+    assert strategy.aprAfterDebtChange(500) == 4 * 10**16
+    assert strategy.aprAfterDebtChange(2_000) == 25 * 10**15
+    assert strategy.aprAfterDebtChange(10**30) == 2 * 10**16
+
+
+def test_piecewise__unsorted_points__reverts(
+    asset, create_vault, create_piecewise_strategy
+):
+    vault = create_vault(asset)
+
+    with ape.reverts("points not sorted"):
+        create_piecewise_strategy(vault, [1_000, 0], [10**16, 10**16])
+
+
+def test_liquidity__limits_withdrawals(
+    asset,
+    create_vault,
+    create_strategy,
+    deposit_into_vault,
+    provide_strategy_with_debt,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    strategy = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy.address, sender=gov)
+    deposit_into_vault(vault, amount)
+    provide_strategy_with_debt(gov, strategy, vault, amount)
+
+    assert strategy.liquidity() == MAX_INT
+    assert strategy.maxWithdraw(vault) == amount
+
+    strategy.setLiquidity(amount // 4, sender=gov)
+    assert strategy.maxWithdraw(vault) == amount // 4
+
+    # the vault only gets back what is liquid
+    vault.update_debt(strategy.address, 0, sender=gov)
+    assert vault.strategies(strategy).current_debt == amount - amount // 4
+    assert strategy.liquidity() == 0
+    assert strategy.maxWithdraw(vault) == 0
+
+
+def test_linear__negative_delta(
+    asset,
+    create_vault,
+    create_strategy,
+    deposit_into_vault,
+    provide_strategy_with_debt,
+    gov,
+    amount,
+):
+    vault = create_vault(asset)
+    strategy = create_strategy(vault, int(10**18), int(10**2))
+    vault.add_strategy(strategy.address, sender=gov)
+    deposit_into_vault(vault, amount)
+    provide_strategy_with_debt(gov, strategy, vault, amount)
+
+    current_apr = strategy.aprAfterDebtChange(0)
+    half_apr = strategy.aprAfterDebtChange(-(amount // 2))
+
+    assert half_apr > current_apr
+    assert half_apr == 10**18 - 10**2 * (amount // 2) // 10_000
+    # removing more than what is supplied is the same as removing everything
+    assert strategy.aprAfterDebtChange(-amount) == 10**18
+    assert strategy.aprAfterDebtChange(-(2**255)) == 10**18
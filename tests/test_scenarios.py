@@ -0,0 +1,86 @@
+from pathlib import Path
+
+from scripts._allocation import LinearCurve, blended_apr, optimal_allocation
+from scripts._scenarios import (
+    Scenario,
+    Score,
+    StrategySpec,
+    load_baseline,
+    load_corpus,
+    play_model,
+    regressions,
+    score,
+)
+
+CORPUS = Path(__file__).parents[1] / "scenarios" / "v1"
+
+
+def test_corpus__loads():
+    scenarios = load_corpus(CORPUS)
+
+    assert len(scenarios) >= 5
+    assert max(len(s.strategies) for s in scenarios) >= 100
+    for scenario in scenarios:
+        debts = [s.debt for s in scenario.strategies]
+        assert 0 <= score(scenario, debts, scenario.idle, 0).quality <= 1
+
+
+def test_optimal_allocation__saturating_curves():
+    # APRs reach 0 at 0.8M and 1M, yields peak halfway
+    curves = [
+        LinearCurve(4 * 10**16, 5 * 10**8),
+        LinearCurve(3 * 10**16, 3 * 10**8),
+    ]
+    total = 3 * 10**12
+    peaks = [4 * 10**11, 5 * 10**11]
+
+    optimum = optimal_allocation(curves, total)
+
+    # filling both to their peak beats deploying everything, the rest stays idle
+    for debt, peak in zip(optimum, peaks):
+        assert abs(debt - peak) <= total // 1_000
+    achieved = blended_apr(curves, optimum, total - sum(optimum))
+    assert achieved * 1_000 >= blended_apr(curves, peaks, total - sum(peaks)) * 999
+    assert achieved > blended_apr(curves, [total - peaks[1], peaks[1]])
+
+    scenario = Scenario(
+        "saturating",
+        "",
+        6,
+        total,
+        tuple(StrategySpec(curve, 0) for curve in curves),
+        (),
+    )
+    assert score(scenario, peaks, total - sum(peaks), 0).quality <= 1
+
+
+def test_regressions():
+    baseline = {"a": {"quality": 0.99, "gas": 100_000}}
+
+    def check(quality, gas, min_quality=0.0):
+        current = {"a": Score(quality, gas, 0, 0)}
+        return regressions(baseline, current, 0.001, 0.05, {"a": min_quality})
+
+    assert check(0.99, 100_000) == []
+    assert check(0.9895, 105_000) == []
+    assert len(check(0.98, 100_000)) == 1
+    assert len(check(0.99, 106_000)) == 1
+    assert len(check(0.99, 100_000, min_quality=0.995)) == 1
+    # a model run has no gas, only the quality is compared
+    assert check(0.99, None) == []
+
+
+def test_regressions__missing_baseline_fails():
+    failures = regressions({}, {"a": Score(1.0, 1, 0, 0)}, 0.001, 0.05)
+
+    assert failures == ["a: no baseline recorded"]
+
+
+def test_baseline__recorded_policies_pass_their_floors():
+    baseline = load_baseline(CORPUS / "baseline.json")
+    scenarios = load_corpus(CORPUS)
+    floors = {s.name: s.min_quality for s in scenarios}
+
+    for policy, chunks in (("built-in", None), ("marginal-apr-20", 20)):
+        scores = {s.name: play_model(s, chunks) for s in scenarios}
+        assert regressions(baseline[policy], scores, 0.001, 0.05, floors) == []
@@ -1,7 +1,19 @@
 import pytest
 import ape
+from hypothesis import HealthCheck, given, settings, strategies as st
 from utils.constants import YEAR, REL_ERROR, MAX_BPS
 
+SECS_PER_YEAR = 31_556_952
+
+
+def expected_fees(debt_seconds, gain, management_fee, performance_fee):
+    # report's formula, applied to the strategy params the vault passes it
+    if gain == 0:
+        return 0
+    total_fees = debt_seconds * management_fee // MAX_BPS // SECS_PER_YEAR
+    total_fees += gain * performance_fee // MAX_BPS
+    return min(total_fees, gain * 7_500 // MAX_BPS)
+
 
 def test_deployment(simple_refunds_accountant, fee_manager):
     assert simple_refunds_accountant.fee_manager() == fee_manager.address
@@ -39,6 +51,7 @@ def test_set_performance_fee__with_valid_performance_fee(
     event = list(tx.decode_logs(simple_refunds_accountant.UpdatePerformanceFee))
 
     assert len(event) == 1
+    assert event[0].strategy == random_strategy
     assert event[0].performance_fee == performance_fee
 
     assert (
@@ -71,6 +84,7 @@ def test_set_management_fee__with_valid_management_fee(
     event = list(tx.decode_logs(simple_refunds_accountant.UpdateManagementFee))
 
     assert len(event) == 1
+    assert event[0].strategy == random_strategy
     assert event[0].management_fee == management_fee
 
     assert (
@@ -502,7 +516,12 @@ def test_distribute(
 
     assert vault.balanceOf(fee_manager) == 0
 
-    simple_refunds_accountant.distribute(vault, sender=fee_manager)
+    tx = simple_refunds_accountant.distribute(vault, sender=fee_manager)
+    event = list(tx.decode_logs(simple_refunds_accountant.DistributeRewards))
+
+    assert len(event) == 1
+    assert event[0].vault == vault.address
+    assert event[0].rewards == 100
 
     assert vault.balanceOf(simple_refunds_accountant) == 0
     assert vault.balanceOf(fee_manager) == 100
@@ -550,3 +569,79 @@ def test_report__gains_cap_to_75_percent_gain(
     )
 
     assert pytest.approx(total_fees, REL_ERROR) == 7_500 * gain / MAX_BPS
+
+
+@settings(
+    max_examples=20,
+    deadline=None,
+    suppress_health_check=[HealthCheck.function_scoped_fixture],
+)
+@given(
+    management_fee=st.integers(0, 1_000),
+    performance_fee=st.integers(0, 1_000),
+    steps=st.lists(
+        st.tuples(
+            st.integers(1, YEAR),
+            st.integers(0, 10**12),
+            # new debt in % of the deposit, None leaves it alone
+            st.none() | st.integers(0, 100),
+        ),
+        min_size=1,
+        max_size=4,
+    ),
+)
+def test_report__matches_vault_params(
+    management_fee,
+    performance_fee,
+    steps,
+    chain,
+    amount,
+    asset,
+    fee_manager,
+    simple_refunds_accountant,
+    create_vault,
+    create_strategy,
+    deposit_into_vault,
+    provide_strategy_with_debt,
+    gov,
+    whale,
+):
+    snapshot = chain.snapshot()
+    try:
+        vault = create_vault(asset, fee_manager=simple_refunds_accountant)
+        strategy = create_strategy(vault, int(10**18), int(10**2))
+        vault.add_strategy(strategy.address, sender=gov)
+        deposit_into_vault(vault, amount)
+        provide_strategy_with_debt(gov, strategy, vault, amount // 2)
+        vault.update_max_debt_for_strategy(strategy.address, amount, sender=gov)
+
+        simple_refunds_accountant.set_management_fee(
+            strategy, management_fee, sender=fee_manager
+        )
+        simple_refunds_accountant.set_performance_fee(
+            strategy, performance_fee, sender=fee_manager
+        )
+
+        for duration, gain, debt_pct in steps:
+            chain.pending_timestamp = chain.pending_timestamp + duration
+            # debt moved between reports, as the debt manager does
+            if debt_pct is not None:
+                new_debt = amount * debt_pct // 100
+                if new_debt != vault.strategies(strategy.address).current_debt:
+                    vault.update_debt(strategy.address, new_debt, sender=gov)
+            if gain:
+                asset.transfer(strategy.address, gain, sender=whale)
+            params = vault.strategies(strategy.address)
+
+            tx = vault.process_report(strategy.address, sender=gov)
+            timestamp = chain.blocks[tx.block_number].timestamp
+
+            event = list(tx.decode_logs(vault.StrategyReported))[0]
+            assert event.total_fees == expected_fees(
+                params.current_debt * (timestamp - params.last_report),
+                event.gain,
+                management_fee,
+                performance_fee,
+            )
+    finally:
+        chain.restore(snapshot)
@@ -0,0 +1,78 @@
+from scripts._state_reader import (
+    TOTAL_ASSETS,
+    StateReader,
+    _decode_addresses,
+    decode_words,
+    encode_address,
+    encode_int256,
+    selector,
+)
+
+STRATEGIES = (
+    "0x" + "11" * 20,
+    "0x" + "ab" * 20,
+)
+
+
+def word(value: int) -> bytes:
+    return value.to_bytes(32, "big")
+
+
+def test_selector():
+    assert selector("transfer(address,uint256)") == bytes.fromhex("a9059cbb")
+    assert TOTAL_ASSETS == bytes.fromhex("01e1d114")
+
+
+def test_encode():
+    assert encode_address(STRATEGIES[1]) == bytes(12) + bytes.fromhex("ab" * 20)
+    assert encode_int256(1) == word(1)
+    assert encode_int256(-1) == b"\xff" * 32
+
+
+def test_decode_words():
+    data = word(7) + word(2**256 - 1) + word(3)
+
+    assert decode_words(data, 2) == (7, 2**256 - 1)
+    assert decode_words(data, 3)[2] == 3
+
+
+def test_decode_addresses():
+    data = word(32) + word(len(STRATEGIES))
+    data += b"".join(encode_address(address) for address in STRATEGIES)
+
+    assert _decode_addresses(data) == STRATEGIES
+    assert _decode_addresses(word(32) + word(0)) == ()
+
+
+class ReversedSession:
+    """Answers a batch back to front, as a server is allowed to."""
+
+    def __init__(self, results):
+        self.results = results
+
+    def post(self, endpoint, json):
+        replies = [
+            {"jsonrpc": "2.0", "id": call["id"], "result": self.results[call["id"]]}
+            for call in json
+        ]
+        return Response(replies[::-1])
+
+
+class Response:
+    def __init__(self, replies):
+        self.replies = replies
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.replies
+
+
+def test_call__matches_replies_by_id():
+    reader = StateReader("http://localhost:8545", STRATEGIES[0], STRATEGIES[1])
+    reader.session = ReversedSession(["0x" + word(1).hex(), "0x" + word(2).hex()])
+
+    results = reader.call([(STRATEGIES[0], b""), (STRATEGIES[1], b"")], 1)
+
+    assert [decode_words(data, 1)[0] for data in results] == [1, 2]
@@ -0,0 +1,111 @@
+"""
+Skip the compilers when the contracts haven't changed since the last build.
+
+ape's own cache can keep stale artifacts around when a compiler setting or a
+dependency changes, which is why CI used to force a full recompile. Instead,
+two hashes are stamped into ``.build`` once the artifacts are compiled: one of
+the contents of ``contracts/``, one of ``ape-config.yaml`` (compiler settings
+and dependency versions) together with the dependency packages ape resolved
+under ``~/.ape/packages``. While both match, the artifacts on disk are loaded as
+they are. A contract edit only recompiles what ape sees changed, anything else
+recompiles everything.
+
+    python tests/utils/compile_cache.py          # compile only if sources changed
+    python tests/utils/compile_cache.py --check  # exit 1 when the build is stale
+    python tests/utils/compile_cache.py --stamp  # mark the current build as fresh
+"""
+import argparse
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+SOURCES = ("contracts",)
+CONFIG = "ape-config.yaml"
+STAMP = Path(".build") / ".sources.sha256"
+# where ape unpacks the manifests of the dependencies it resolved
+PACKAGES = Path(os.environ.get("APE_DATA_FOLDER", Path.home() / ".ape")) / "packages"
+
+
+def _digest(files: Iterable[Path], base: Path) -> str:
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(path.relative_to(base).as_posix().encode() + b"\0")
+        digest.update(path.read_bytes() + b"\0")
+    return digest.hexdigest()
+
+
+def _tree(directory: Path):
+    return sorted(path for path in directory.rglob("*") if path.is_file())
+
+
+def source_hash(root: Path) -> str:
+    return _digest([path for s in SOURCES for path in _tree(root / s)], root)
+
+
+def dependency_hash(root: Path, packages: Path = PACKAGES) -> str:
+    digest = hashlib.sha256((root / CONFIG).read_bytes())
+    if packages.is_dir():
+        digest.update(_digest(_tree(packages), packages).encode())
+    return digest.hexdigest()
+
+
+def _hashes(root: Path) -> Tuple[str, str]:
+    return source_hash(root), dependency_hash(root)
+
+
+def read_stamp(root: Path) -> Optional[Tuple[str, str]]:
+    stamp = root / STAMP
+    if not stamp.is_file():
+        return None
+    lines = stamp.read_text().split()
+    return (lines[0], lines[1]) if len(lines) == 2 else None
+
+
+def is_fresh(root: Path) -> bool:
+    return read_stamp(root) == _hashes(root)
+
+
+def write_stamp(root: Path) -> None:
+    stamp = root / STAMP
+    stamp.parent.mkdir(exist_ok=True)
+    stamp.write_text("\n".join(_hashes(root)) + "\n")
+
+
+def compile_if_stale(root: Path) -> bool:
+    """Load the artifacts, compiling whatever is stale, returns whether it did."""
+    from ape import project
+
+    stamped, current = read_stamp(root), _hashes(root)
+    if stamped == current:
+        project.load_contracts()
+        return False
+
+    # ape's cache is only trusted while the settings and dependencies hold
+    project.load_contracts(use_cache=stamped is not None and stamped[1] == current[1])
+    write_stamp(root)
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--check", action="store_true", help="Exit 1 if stale.")
+    mode.add_argument("--stamp", action="store_true", help="Mark as fresh.")
+    parser.add_argument("--root", type=Path, default=Path.cwd())
+    args = parser.parse_args()
+
+    if args.check:
+        return 0 if is_fresh(args.root) else 1
+    if args.stamp:
+        write_stamp(args.root)
+        return 0
+
+    compiled = compile_if_stale(args.root)
+    print("compiled" if compiled else "artifacts up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
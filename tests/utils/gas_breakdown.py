@@ -0,0 +1,48 @@
+from hexbytes import HexBytes
+
+from scripts._gas_profile import GasProfiler, render_breakdown
+
+USER_PROPERTY = "gas-breakdown"
+
+
+class GasBreakdownReport:
+    """
+    Pytest plugin enabled by ``--gas-breakdown``: traces every watched
+    transaction mined during a test and prints its gas breakdown at the end
+    of the run. The breakdowns travel in the test reports, so under
+    pytest-xdist the controller prints what every worker traced.
+    """
+
+    def __init__(self):
+        self.profiler = GasProfiler()
+        self.breakdowns = []
+
+    def collect(self, item, chain, first_block: int, last_block: int):
+        web3 = chain.provider.web3
+        for number in range(first_block, last_block + 1):
+            block = web3.eth.get_block(number, full_transactions=True)
+            for txn in block.transactions:
+                if not txn["to"] or not self.profiler.is_watched(
+                    txn["to"], txn["input"]
+                ):
+                    continue
+
+                receipt = chain.provider.get_receipt(HexBytes(txn["hash"]).hex())
+                breakdown = self.profiler.breakdown(receipt, item.nodeid)
+                item.user_properties.append(
+                    (USER_PROPERTY, render_breakdown(breakdown))
+                )
+
+    def pytest_runtest_logreport(self, report):
+        # collected while tearing the test down, only that report carries them
+        if report.when != "teardown":
+            return
+        self.breakdowns.extend(
+            value for name, value in report.user_properties if name == USER_PROPERTY
+        )
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_sep("=", "gas breakdown")
+        for breakdown in self.breakdowns:
+            terminalreporter.write_line(breakdown)
+            terminalreporter.write_line("")
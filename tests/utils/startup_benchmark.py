@@ -0,0 +1,69 @@
+"""
+Time how long the test suite takes to start, i.e. to collect every test.
+
+    python tests/utils/startup_benchmark.py --runs 5
+
+Each run is a fresh ``pytest --collect-only`` process, so it pays for loading
+pytest, ape and every installed plugin. Also lists the installed ape plugins
+that ``requirements-test.txt`` doesn't need.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from importlib import metadata
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def time_collection(runs: int, extra_args) -> list:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "pytest", "--collect-only", "-q", *extra_args],
+            cwd=ROOT,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def extra_plugins() -> list:
+    required = {
+        line.split(">")[0].split("=")[0].strip().lower()
+        for line in (ROOT / "requirements-test.txt").read_text().splitlines()
+        if line.strip() and not line.startswith("#")
+    }
+    installed = {
+        dist.metadata["Name"].lower()
+        for dist in metadata.distributions()
+        if dist.metadata["Name"] and dist.metadata["Name"].lower().startswith("ape-")
+    }
+    return sorted(installed - required)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("pytest_args", nargs="*", help="Passed on to pytest.")
+    args = parser.parse_args()
+
+    durations = time_collection(args.runs, args.pytest_args)
+    print(
+        f"collection over {args.runs} runs: "
+        f"median {statistics.median(durations):.2f}s, "
+        f"min {min(durations):.2f}s, max {max(durations):.2f}s"
+    )
+
+    extra = extra_plugins()
+    if extra:
+        print(f"plugins loaded but not needed by the tests: {', '.join(extra)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
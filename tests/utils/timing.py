@@ -0,0 +1,28 @@
+from collections import defaultdict
+
+
+class ModuleTimings:
+    """
+    Pytest plugin adding up the setup, call and teardown time of every test
+    per module. Under pytest-xdist it runs on the controller, which receives
+    the reports of every worker, so the totals cover the whole run.
+    """
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.tests = defaultdict(int)
+
+    def pytest_runtest_logreport(self, report):
+        module = report.nodeid.split("::")[0]
+        self.durations[module] += report.duration
+        if report.when == "call":
+            self.tests[module] += 1
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_sep("=", "time per test module")
+        for module, seconds in sorted(
+            self.durations.items(), key=lambda item: item[1], reverse=True
+        ):
+            terminalreporter.write_line(
+                f"{seconds:9.2f}s {self.tests[module]:5d} tests  {module}"
+            )